@@ -0,0 +1,122 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from src.graph import Graph
+from src.options import Options
+from src.stats import PRIMITIVES, Stats
+from src.utils.components import solveWithOptions
+from src.utils.generators import GENERATORS
+from src.utils.parseFile import parseFileAndReturnGraph
+from src.utils.verify import verifyMatching
+
+
+def readExpected(fileName: str) -> Optional[float]:
+  if not os.path.exists(fileName):
+    return None
+  with open(fileName, 'r') as file:
+    return float(file.readline())
+
+def solve(name: str, graph: Graph, expected: Optional[float], measureMemory: bool, options: Options, collectStats: bool) -> Dict[str, Any]:
+  # Solved the same way as by run.py. The stats keep the graph out of the dense mode, so they are only collected if asked.
+  stats = Stats() if collectStats else None
+  if measureMemory:
+    tracemalloc.start()
+  start = time.perf_counter()
+  selected = solveWithOptions(graph, options, stats)
+  wallTime = time.perf_counter() - start
+  peakMemory = None
+  if measureMemory:
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+  total = float(graph.capacities[selected].sum())
+  problems = verifyMatching(graph, selected, perfect=not options.maxWeight)
+
+  return {
+    'name': name,
+    'vertices': graph.vertexCount,
+    'edges': graph.edgeCount,
+    'total': total,
+    'expected': expected,
+    'ok': len(problems) == 0 and (expected is None or total == expected),
+    'time': wallTime,
+    'peakMemory': peakMemory,
+    'counts': None if stats is None else stats.counts,
+  }
+
+def printResult(result: Dict[str, Any]) -> None:
+  counts = "" if result['counts'] is None else " " + " ".join(f"{primitive}={result['counts'][primitive]}" for primitive in PRIMITIVES)
+  memory = "" if result['peakMemory'] is None else f" {result['peakMemory'] / 2 ** 20:.1f}MiB"
+  status = "OK" if result['ok'] else "FAIL"
+  print(f"{status:<4} {result['name']:<24} n={result['vertices']} m={result['edges']} total={result['total']:g} "
+        f"{result['time']:.3f}s{memory}{counts}")
+
+def main() -> int:
+  parser = argparse.ArgumentParser(description="Runs the solver on the data files and on generated graphs.")
+  parser.add_argument('--data', default='data', help="directory with the .in and .out files")
+  parser.add_argument('--skip-data', action='store_true', help="do not run the data files")
+  parser.add_argument('--generator', choices=sorted(GENERATORS), action='append', default=[], help="generated graphs to run, can be repeated")
+  parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help="numbers of vertices of the generated graphs")
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--memory', action='store_true', help="measure the peak memory with tracemalloc, which slows the run down")
+  parser.add_argument('--warm-start', action='store_true', help="start every run from a greedy matching and charges")
+  parser.add_argument('--save', help="save the results as JSON")
+  parser.add_argument('--baseline', help="JSON results of a previous run to compare the times with")
+  parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative slowdown against the baseline")
+  parser.add_argument('--integer', action='store_true', help="compute with doubled integer capacities")
+  parser.add_argument('--dense', action=argparse.BooleanOptionalAction, help="force or turn off the dense mode, by default it is used for dense graphs")
+  parser.add_argument('--components', action='store_true', help="solve the connected components separately")
+  parser.add_argument('--kernel', action='store_true', help="first reduce the graph by forced edges, parallel edges and vertices with two neighbours")
+  parser.add_argument('--max-weight', action='store_true', help="find the matching of the maximum weight, the expected results of the data files are not checked")
+  parser.add_argument('--jobs', type=int, default=1, help="number of processes for the components")
+  parser.add_argument('--stats', action='store_true', help="count the primitives, the graphs are not solved in the dense mode then")
+  args = parser.parse_args()
+  if args.max_weight and (args.warm_start or args.components or args.kernel):
+    parser.error("--max-weight can not be combined with --warm-start, --components or --kernel")
+  if args.dense and args.stats:
+    parser.error("--dense can not be combined with --stats")
+  options = Options(warmStart=args.warm_start, integer=args.integer, components=args.components, kernel=args.kernel,
+                    jobs=args.jobs, dense=args.dense, maxWeight=args.max_weight)
+
+  results: List[Dict[str, Any]] = []
+  if not args.skip_data:
+    for fileName in sorted(glob.glob(os.path.join(args.data, '*.in'))):
+      name = os.path.splitext(os.path.basename(fileName))[0]
+      expected = None if args.max_weight else readExpected(os.path.splitext(fileName)[0] + '.out')
+      results.append(solve(name, parseFileAndReturnGraph(fileName), expected, args.memory, options, args.stats))
+      printResult(results[-1])
+
+  for generator in args.generator:
+    for size in args.sizes:
+      name = f"{generator}_{size}_{args.seed}"
+      results.append(solve(name, GENERATORS[generator](size, args.seed), None, args.memory, options, args.stats))
+      printResult(results[-1])
+
+  failed = [result['name'] for result in results if not result['ok']]
+
+  slower: List[str] = []
+  if args.baseline is not None:
+    with open(args.baseline, 'r') as file:
+      baseline = {result['name']: result for result in json.load(file)}
+    for result in results:
+      previous = baseline.get(result['name'])
+      if previous is not None and result['time'] > previous['time'] * (1 + args.tolerance):
+        slower.append(result['name'])
+        print(f"SLOWER {result['name']}: {previous['time']:.3f}s -> {result['time']:.3f}s")
+
+  if args.save is not None:
+    with open(args.save, 'w') as file:
+      json.dump(results, file, indent=2)
+
+  if len(failed) > 0:
+    print("Wrong results:", " ".join(failed), file=sys.stderr)
+  return 1 if len(failed) > 0 or len(slower) > 0 else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -1,18 +1,134 @@
+import argparse
+import concurrent.futures
+import copy
+import glob
+import os
 import sys
+import time
+from typing import List, Optional, Tuple
 
-from src.utils.parseFile import parseFileAndReturnInstance
+from src.budget import Budget
+from src.options import Options
+from src.stats import Stats
+from src.utils.components import solveWithOptions
+from src.utils.coordinates import parseCoordinateFile, solveCoordinates
+from src.utils.parseFile import parseFileAndReturnGraph
+from src.utils.writeFile import getMatching, writeMatchingToFile
 
 
-def run(file: str) -> None:
-  instance = parseFileAndReturnInstance(file)
-  instance.run()
+def solveFile(file: str, options: Options, stats: Optional[Stats] = None, budget: Optional[Budget] = None) -> Tuple[float, List[str]]:
+  # With neighbours, the file contains points of a complete graph instead of edges.
+  if options.neighbours is not None:
+    return getMatching(solveCoordinates(parseCoordinateFile(file), options.neighbours, options, stats))
 
-  totalWeight = 0.0
-  for edge in instance.selectedEdges:
-    totalWeight += edge.capacity
-    print(edge.textRepr)
-  print("Total weight", totalWeight)
+  graph = parseFileAndReturnGraph(file, options.useCache)
+  selected = solveWithOptions(graph, options, stats, budget)
+  return float(graph.capacities[selected].sum()), graph.getLabels(selected)
+
+def run(file: str, options: Options, showStats: bool = False) -> None:
+  stats = Stats() if showStats else None
+  budget = None
+  if options.maxActions is not None or options.maxSeconds is not None:
+    budget = Budget(options.maxActions, options.maxSeconds)
+  weight, labels = solveFile(file, options, stats, budget)
+
+  sys.stdout.write("".join(label + "\n" for label in labels))
+  print("Total weight", weight)
+  if budget is not None:
+    print(budget.report(), file=sys.stderr)
+  if stats is not None:
+    print(stats.report(), file=sys.stderr)
+
+def solveToFile(file: str, outputFile: str, options: Options) -> Tuple[str, float, float]:
+  start = time.perf_counter()
+  weight, labels = solveFile(file, options)
+  writeMatchingToFile(weight, labels, outputFile)
+  return file, weight, time.perf_counter() - start
+
+def getInputFiles(paths: List[str]) -> List[str]:
+  files: List[str] = []
+  for path in paths:
+    if os.path.isdir(path):
+      files.extend(sorted(glob.glob(os.path.join(path, '*.in'))))
+    else:
+      files.append(path)
+  return files
+
+def runBatch(files: List[str], outputDirectory: str, options: Options) -> None:
+  # Every file is solved in a separate process and its result is written to the output directory in the .out format.
+  # The components of one file are not solved in more processes then.
+  fileOptions = copy.copy(options)
+  fileOptions.jobs = 1
+  os.makedirs(outputDirectory, exist_ok=True)
+  results: List[Tuple[str, float, float]] = []
+  failed: List[str] = []
+  with concurrent.futures.ProcessPoolExecutor(max_workers=options.jobs) as executor:
+    futures = {}
+    for file in files:
+      outputFile = os.path.join(outputDirectory, os.path.splitext(os.path.basename(file))[0] + '.out')
+      futures[executor.submit(solveToFile, file, outputFile, fileOptions)] = file
+    for future in concurrent.futures.as_completed(futures):
+      try:
+        results.append(future.result())
+      except Exception as exception:
+        failed.append(futures[future])
+        print(f"{futures[future]}: {exception!r}", file=sys.stderr)
+
+  width = max([len("file")] + [len(file) for file in files])
+  print(f"{'file':<{width}} {'weight':>14} {'time [s]':>10}")
+  for file, weight, seconds in sorted(results):
+    print(f"{file:<{width}} {weight:>14g} {seconds:>10.3f}")
+  print(f"Solved {len(results)} of {len(files)} files")
+  if len(failed) > 0:
+    sys.exit(1)
 
 if __name__ == '__main__':
-  assert len(sys.argv) > 1
-  run(sys.argv[1])
+  parser = argparse.ArgumentParser(description="Finds a minimum cost perfect matching.")
+  parser.add_argument('files', nargs='+', help="input files with the number of vertices and edges followed by lines u v w, or directories with .in files")
+  parser.add_argument('--cache', action='store_true', help="store the parsed graph in a binary file next to the input and reuse it")
+  parser.add_argument('--stats', action='store_true', help="print counts and times of the primitives to stderr")
+  parser.add_argument('--warm-start', action='store_true', help="start from a greedy matching and charges")
+  parser.add_argument('--integer', action='store_true', help="compute with doubled integer capacities and exact integer charges")
+  parser.add_argument('--coordinates', action='store_true', help="the inputs are points of complete graphs, TSPLIB files or the number of points followed by lines x y")
+  parser.add_argument('--neighbours', type=int, default=10, help="number of nearest neighbours of every point to start with in the coordinate mode")
+  parser.add_argument('--components', action='store_true', help="solve the connected components separately, in parallel processes for a single file")
+  parser.add_argument('--kernel', action='store_true', help="first reduce the graph by forced edges, parallel edges and vertices with two neighbours")
+  parser.add_argument('--output-dir', default='results', help="directory for the .out files when solving more files")
+  parser.add_argument('--checkpoint', help="save the state of the solver to this file during the run")
+  parser.add_argument('--checkpoint-every', type=int, help="save the state every this many actions")
+  parser.add_argument('--checkpoint-seconds', type=float, help="save the state every this many seconds")
+  parser.add_argument('--resume', help="continue from a state saved by --checkpoint, the input file has to be the same")
+  parser.add_argument('--max-actions', type=int, help="stop after this many actions and print the partial matching with a lower bound on the optimum")
+  parser.add_argument('--max-seconds', type=float, help="stop after this many seconds and print the partial matching with a lower bound on the optimum")
+  parser.add_argument('--export-duals', help="save the final charges of the vertices and blossoms to this file, to be checked by verify.py")
+  parser.add_argument('--dense', action=argparse.BooleanOptionalAction, help="solve with a weight matrix of all the pairs of vertices, by default if the graph is dense and its weights are integers")
+  parser.add_argument('--max-weight', action='store_true', help="find the matching of the maximum weight, vertices can stay unmatched")
+  parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="number of processes when solving more files")
+  args = parser.parse_args()
+
+  if (args.checkpoint is not None or args.resume is not None) and (args.coordinates or args.components or args.kernel):
+    parser.error("--checkpoint and --resume can not be combined with --coordinates, --components or --kernel")
+  if (args.max_actions is not None or args.max_seconds is not None) and (args.coordinates or args.components or args.kernel):
+    parser.error("--max-actions and --max-seconds can not be combined with --coordinates, --components or --kernel")
+  if args.export_duals is not None and (args.coordinates or args.components or args.kernel):
+    parser.error("--export-duals can not be combined with --coordinates, --components or --kernel")
+  if args.dense and (args.checkpoint is not None or args.resume is not None or args.export_duals is not None or
+                     args.max_actions is not None or args.max_seconds is not None or args.stats):
+    parser.error("--dense can not be combined with --checkpoint, --resume, --export-duals, --max-actions, --max-seconds or --stats")
+  if args.max_weight and (args.warm_start or args.coordinates or args.components or args.kernel):
+    parser.error("--max-weight can not be combined with --warm-start, --coordinates, --components or --kernel")
+  if args.checkpoint is not None and args.checkpoint_every is None and args.checkpoint_seconds is None:
+    args.checkpoint_seconds = 60.0
+
+  options = Options(args.cache, args.warm_start, args.integer, args.neighbours if args.coordinates else None,
+                    args.components, args.kernel, args.jobs or 1, args.checkpoint, args.checkpoint_every,
+                    args.checkpoint_seconds, args.resume, args.max_actions, args.max_seconds,
+                    args.export_duals, args.dense, args.max_weight)
+  files = getInputFiles(args.files)
+  if len(files) == 1 and not os.path.isdir(args.files[0]):
+    run(files[0], options, args.stats)
+  elif options.maxActions is not None or options.maxSeconds is not None or options.exportDuals is not None or \
+       options.checkpoint is not None or options.resume is not None:
+    parser.error("--max-actions, --max-seconds, --export-duals, --checkpoint and --resume need a single input file")
+  else:
+    runBatch(files, args.output_dir, options)
@@ -0,0 +1,63 @@
+import time
+from typing import Optional
+
+from src.instance import Instance
+
+
+class Budget:
+  """
+  Limits a run to a number of actions or seconds. When the run stops early, the budget keeps what is known about
+  the optimum at that moment: the weight of the partial matching and the dual objective, which is a lower bound
+  on the weight of every perfect matching.
+
+  Without a perfect matching the instance works on the negated weights, so both are negated back and the bound is
+  an upper bound on the weight of every matching.
+  """
+  maxActions: Optional[int]
+  maxSeconds: Optional[float]
+  actions: int
+  start: float
+  finished: bool
+  maximum: bool # Set if the bound is an upper bound on the weight of a matching of the maximum weight
+  bound: float
+  partialWeight: float
+  unmatched: int
+
+  def __init__(self, maxActions: Optional[int] = None, maxSeconds: Optional[float] = None) -> None:
+    self.maxActions = maxActions
+    self.maxSeconds = maxSeconds
+    self.actions = 0
+    self.start = time.monotonic()
+    self.finished = False
+    self.maximum = False
+    self.bound = 0
+    self.partialWeight = 0
+    self.unmatched = 0
+
+  def isExhausted(self) -> bool:
+    return (self.maxActions is not None and self.actions >= self.maxActions) or \
+           (self.maxSeconds is not None and time.monotonic() - self.start >= self.maxSeconds)
+
+  def update(self) -> None:
+    self.actions += 1
+
+  def finish(self, instance: Instance) -> None:
+    sign = 1 if instance.perfect else -1
+    self.finished = instance.isFinished()
+    self.maximum = not instance.perfect
+    self.bound = sign * instance.getDualObjective()
+    self.partialWeight = sign * sum(edge.capacity for edge in instance.selectedEdges.values()) / instance.scale
+    self.unmatched = len(instance.vertices) - 2 * len(instance.selectedEdges)
+
+  @property
+  def gap(self) -> float:
+    # Every edge of the partial matching is full, so this is the part of the dual objective which is not paid by
+    # the edges of the matching, the charges of the flowers with no matched edge leaving them. With the weights
+    # negated back, the upper bound is above the weight by the same amount.
+    return self.bound - self.partialWeight
+
+  def report(self) -> str:
+    if self.finished:
+      return f"Finished after {self.actions} actions, the matching is optimal"
+    return (f"Stopped after {self.actions} actions: {self.unmatched} vertices unmatched, partial weight {self.partialWeight:g}, "
+            f"{'upper' if self.maximum else 'lower'} bound {self.bound:g}, gap {self.gap:g}")
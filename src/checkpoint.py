@@ -0,0 +1,139 @@
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from src.dataStructures import Dumbbell, Edge, Flower, Tree
+from src.enums.edge import EdgeType
+from src.enums.flower import FlowerType
+from src.instance import Instance
+from src.utils.writeFile import saveArrays
+
+
+def saveState(instance: Instance, fileName: str) -> None:
+  """
+  Saves the whole state of the solver between two actions: the edges, the charges of all the flowers, the nesting
+  of blossoms and the trees and dumbbells. The event queue is not saved, it is scheduled again after loading.
+  """
+  flowers = instance.getAllFlowers()
+  ids: Dict[Flower, int] = {flower: id for id, flower in enumerate(flowers)}
+  blossoms = flowers[len(instance.vertices):]
+  chargeType = np.float64 if instance.scale == 1 else np.int64
+
+  def getOffsets(lists: List[List[Flower]]) -> npt.NDArray[np.int64]:
+    return np.concatenate([[0], np.cumsum([len(items) for items in lists], dtype=np.int64)])
+
+  arrays: Dict[str, npt.NDArray[Any]] = {
+    'scale': np.array(instance.scale, dtype=np.int64),
+    'perfect': np.array(instance.perfect),
+    'globalDelta': np.array(instance.globalDelta, dtype=chargeType),
+    'vertexCount': np.array(len(instance.vertices), dtype=np.int64),
+    'endpoints': np.array([(edge.v1.id, edge.v2.id) for edge in instance.edges], dtype=np.int64).reshape(-1, 2),
+    'capacities': np.array([edge.capacity for edge in instance.edges], dtype=chargeType),
+    'edgeTypes': instance.edgeTypes[:len(instance.edges)],
+    'charges': np.array([flower.charge for flower in flowers], dtype=chargeType),
+    'chargeSince': np.array([flower.chargeSince for flower in flowers], dtype=chargeType),
+    'chargeDirections': np.array([flower.chargeDirection for flower in flowers], dtype=np.int8),
+    'types': np.array([flower.type.value for flower in flowers], dtype=np.int8),
+    'parents': np.array([ids[flower.parent] if flower.parent is not None else -1 for flower in flowers], dtype=np.int64),
+    'parentEdges': np.array([flower.parentEdge.id if flower.parentEdge is not None else -1 for flower in flowers], dtype=np.int64),
+    'childrenOffsets': getOffsets([flower.children for flower in flowers]),
+    'children': np.array([ids[child] for flower in flowers for child in flower.children], dtype=np.int64),
+    'innerOffsets': getOffsets([blossom.innerFlowers for blossom in blossoms]),
+    'innerFlowers': np.array([ids[inner] for blossom in blossoms for inner in blossom.innerFlowers], dtype=np.int64),
+    'innerEdges': np.array([edge.id for blossom in blossoms for edge in blossom.innerEdges], dtype=np.int64),
+    'roots': np.array([ids[tree.root] for tree in instance.trees.values()], dtype=np.int64),
+    'dumbbells': np.array([(ids[dumbbell.f1], ids[dumbbell.f2], dumbbell.edge.id) for dumbbell in instance.dumbbells.values()], dtype=np.int64).reshape(-1, 3),
+  }
+  saveArrays(arrays, fileName)
+
+def loadState(fileName: str) -> Instance:
+  with np.load(fileName) as data:
+    arrays = {name: data[name] for name in data.files}
+
+  instance = Instance()
+  instance.scale = int(arrays['scale'])
+  instance.perfect = bool(arrays['perfect'])
+  instance.globalDelta = arrays['globalDelta'].item()
+  for _ in range(int(arrays['vertexCount'])):
+    instance.createVertex()
+
+  capacities = arrays['capacities'].tolist()
+  for id, ((u, v), type) in enumerate(zip(arrays['endpoints'].tolist(), arrays['edgeTypes'].tolist())):
+    edge = Edge(instance.vertices[u], instance.vertices[v], capacities[id], EdgeType(type) if type != 0 else EdgeType.OTHER, id)
+    instance.addEdge(edge)
+    if type == 0:
+      # A deleted edge, only kept so that the ids do not change.
+      instance.edgeTypes[id] = 0
+      instance.vertices[u].edges.remove(edge)
+      instance.vertices[v].edges.remove(edge)
+
+  flowers: List[Flower] = list(instance.vertices)
+  innerOffsets = arrays['innerOffsets'].tolist()
+  innerFlowers = arrays['innerFlowers'].tolist()
+  innerEdges = arrays['innerEdges'].tolist()
+  for blossom in range(len(innerOffsets) - 1):
+    inner = [flowers[id] for id in innerFlowers[innerOffsets[blossom]:innerOffsets[blossom + 1]]]
+    flower = Flower(None, None, [], inner, [instance.edges[id] for id in innerEdges[innerOffsets[blossom]:innerOffsets[blossom + 1]]])
+    for innerFlower in inner:
+      innerFlower.outerFlower = flower
+    flowers.append(flower)
+
+  charges = arrays['charges'].tolist()
+  chargeSince = arrays['chargeSince'].tolist()
+  chargeDirections = arrays['chargeDirections'].tolist()
+  types = arrays['types'].tolist()
+  parents = arrays['parents'].tolist()
+  parentEdges = arrays['parentEdges'].tolist()
+  childrenOffsets = arrays['childrenOffsets'].tolist()
+  children = arrays['children'].tolist()
+  for id, flower in enumerate(flowers):
+    flower.charge = charges[id]
+    flower.chargeSince = chargeSince[id]
+    flower.chargeDirection = chargeDirections[id]
+    flower.parent = flowers[parents[id]] if parents[id] >= 0 else None
+    flower.parentEdge = instance.edges[parentEdges[id]] if parentEdges[id] >= 0 else None
+    flower.children = [flowers[child] for child in children[childrenOffsets[id]:childrenOffsets[id + 1]]]
+    if flower.outerFlower is None:
+      flower.setTotalOuterFlower(flower)
+
+  for root in arrays['roots'].tolist():
+    tree = Tree(flowers[root])
+    for flower in tree.root.getAllSuccessors():
+      flower.tree = tree
+    instance.addTree(tree)
+
+  for f1, f2, edgeId in arrays['dumbbells'].tolist():
+    instance.addDumbbell(Dumbbell(flowers[f1], flowers[f2], instance.edges[edgeId]))
+
+  for id, flower in enumerate(flowers):
+    flower.type = FlowerType(types[id])
+
+  return instance
+
+
+class Checkpoint:
+  """
+  Saves the state of the instance into a file during a run, every given number of actions or seconds.
+  """
+  fileName: str
+  everyActions: Optional[int]
+  everySeconds: Optional[float]
+  actions: int
+  lastSave: float
+
+  def __init__(self, fileName: str, everyActions: Optional[int] = None, everySeconds: Optional[float] = None) -> None:
+    self.fileName = fileName
+    self.everyActions = everyActions
+    self.everySeconds = everySeconds
+    self.actions = 0
+    self.lastSave = time.monotonic()
+
+  def update(self, instance: Instance) -> None:
+    self.actions += 1
+    now = time.monotonic()
+    if (self.everyActions is not None and self.actions % self.everyActions == 0) or \
+       (self.everySeconds is not None and now - self.lastSave >= self.everySeconds):
+      saveState(instance, self.fileName)
+      self.lastSave = now
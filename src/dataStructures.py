@@ -1,22 +1,22 @@
 from __future__ import annotations
-import sys
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 
 from src.enums.edge import EdgeType
+from src.enums.flower import FlowerType
 
 
 class Tree:
+  __slots__ = ('root',)
   root: Flower
 
   def __init__(self, root: Flower):
     self.root = root
+    root.type = FlowerType.EVEN
+    root.tree = self
 
   def __repr__(self) -> str:
     return f"Tree rooted at {self.root}"
 
-  def getNoVertexWithZeroCharge(self) -> Optional[Flower]:
-    return self.root.getNoVertexWithZeroCharge(0)
-  
   @staticmethod
   def isAlternatingPath(node: Flower) -> bool:
     while len(node.children) != 0:
@@ -61,36 +61,71 @@ class Tree:
   @staticmethod
   def getSubtreesNotInAlternatingPath(root: Flower, alternatingPath: list[Flower]) -> list[Flower]:
     result: list[Flower] = []
-    nextInPath: Optional[Flower] = None
-    for child in root.children:
+    nextInPath: Optional[Flower] = root
+    while nextInPath is not None:
+      node = nextInPath
+      nextInPath = None
+      for child in node.children:
         if child not in alternatingPath:
-            result.append(child)
+          result.append(child)
         else:
-           nextInPath = child
-    if nextInPath is not None:
-       result.extend(Tree.getSubtreesNotInAlternatingPath(nextInPath, alternatingPath))
+          nextInPath = child
 
     return result
     
 
 class Flower:
+  __slots__ = ('parent', 'parentEdge', 'children', 'outerFlower', 'totalOuterFlower', 'innerFlowers', 'innerEdges',
+               'lowestLevelFlowers', 'lowestLevelFlowerSet', 'charge', 'chargeDirection', 'chargeSince', 'edges',
+               'eventStamp', 'type', 'tree', 'dumbbell', 'id')
   parent: Optional['Flower']
   parentEdge: Optional[Edge]
   children: List['Flower']
   outerFlower: Optional['Flower']
+  totalOuterFlower: 'Flower' # The outermost flower containing this one, kept up to date by P1 and P3
   innerFlowers: List['Flower']
-  charge: float
+  innerEdges: List[Edge] # innerEdges[i] connects innerFlowers[i] and innerFlowers[i+1], the last one goes back to the first
+  lowestLevelFlowers: List['Flower'] # Cached when the flower is created, the inner flowers do not change
+  lowestLevelFlowerSet: FrozenSet['Flower'] # Only for flowers which are not vertices
+  charge: float # The charge at the time chargeSince, it changes by chargeDirection times the epsilon since then
+  chargeDirection: int
+  chargeSince: float
   edges: List[Edge] # Only for flowers representing vertices
-  textRepr: str = ""
+  eventStamp: int
+  type: FlowerType # Position of the flower, kept up to date by P1 - P4
+  tree: Optional[Tree] # Only for outer flowers in trees
+  dumbbell: Optional[Dumbbell] # Only for outer flowers in dumbbells
+  id: int # Index of the vertex in the instance, -1 for flowers which are not vertices
 
-  def __init__(self, parent: Optional['Flower'], parentEdge: Optional[Edge], children: List['Flower'], innerFlowers: List['Flower']) -> None:
+  def __init__(self, parent: Optional['Flower'], parentEdge: Optional[Edge], children: List['Flower'], innerFlowers: List['Flower'], innerEdges: List[Edge]) -> None:
     self.parent = parent
     self.parentEdge = parentEdge
     self.children = children
     self.innerFlowers = innerFlowers
+    self.innerEdges = innerEdges
+    self.lowestLevelFlowers = [self]
+    self.lowestLevelFlowerSet = frozenset()
+    if len(innerFlowers) > 0:
+      self.lowestLevelFlowers = [vertex for inner in innerFlowers for vertex in inner.lowestLevelFlowers]
+      self.lowestLevelFlowerSet = frozenset(self.lowestLevelFlowers)
     self.charge = 0
+    self.chargeDirection = 0
+    self.chargeSince = 0
     self.outerFlower = None
+    self.totalOuterFlower = self
     self.edges = []
+    self.eventStamp = 0
+    self.type = FlowerType.EVEN
+    self.tree = None
+    self.dumbbell = None
+    self.id = -1
+
+  @property
+  def textRepr(self) -> str:
+    # Built only when printed, the name of a blossom lists all of its inner flowers.
+    if self.isOnlyVertex():
+      return str(self.id + 1)
+    return str(self.innerFlowers)
 
   def __str__(self) -> str:
     return self.textRepr
@@ -101,145 +136,160 @@ class Flower:
   def isOnlyVertex(self) -> bool:
     return len(self.innerFlowers) == 0
   
-  def getTotalCharge(self, otherVertex: Flower) -> float:
-    if otherVertex in self.getAllLowestLevelFlowers():
-      return 0
-    if self.outerFlower is None:
-      return self.charge
-    return self.charge + self.outerFlower.getTotalCharge(otherVertex)
+  def getCharge(self, globalDelta: float) -> float:
+    return self.charge + self.chargeDirection * (globalDelta - self.chargeSince)
+
+  def setChargeDirection(self, direction: int, globalDelta: float) -> None:
+    # Materialize the charge, from now on it changes in the new direction.
+    self.charge = self.getCharge(globalDelta)
+    self.chargeSince = globalDelta
+    self.chargeDirection = direction
+
+  def getTotalCharge(self, otherVertex: Flower, globalDelta: float) -> float:
+    # Charges of this flower and the flowers containing it, up to the first one which contains the other vertex too.
+    charge: float = 0
+    flower: Optional[Flower] = self
+    while flower is not None and not flower.containsVertex(otherVertex):
+      charge += flower.getCharge(globalDelta)
+      flower = flower.outerFlower
+    return charge
   
   def isInAlternatingPath(self) -> bool:
-    if self.parent is not None:
-      return self.parent.isInAlternatingPath()
-    
-    return Tree.isAlternatingPath(self)
+    return Tree.isAlternatingPath(self.getRoot())
   
   def getTotalOuterFlower(self) -> 'Flower':
-    if self.outerFlower is None:
-      return self
-    
-    return self.outerFlower.getTotalOuterFlower()
+    return self.totalOuterFlower
+
+  def setTotalOuterFlower(self, totalOuterFlower: 'Flower') -> None:
+    # Sets it for all the nested flowers, without recursion since the nesting can be deep.
+    stack = [self]
+    while len(stack) > 0:
+      flower = stack.pop()
+      flower.totalOuterFlower = totalOuterFlower
+      stack.extend(flower.innerFlowers)
   
   def depth(self) -> int:
-    if self.parent is None:
-      return 0
-    
-    return 1 + self.parent.depth()
+    depth = 0
+    flower = self
+    while flower.parent is not None:
+      flower = flower.parent
+      depth += 1
+    return depth
   
   def getPathToPredecessor(self, flower: 'Flower') -> List['Flower']:
-    if self == flower:
-      return [self]
-    
-    if self.parent == None:
-      raise ValueError("There is no path between selected flowers. One is not the predecessor of other.")
-    
-    assert self.parent is not None
-    assert self.parentEdge is not None
-    assert self.parentEdge.type in [EdgeType.BLOCKED, EdgeType.SELECTED]
-    return [self] + self.parent.getPathToPredecessor(flower)
+    path = [self]
+    while path[-1] != flower:
+      current = path[-1]
+      if current.parent is None:
+        raise ValueError("There is no path between selected flowers. One is not the predecessor of other.")
+      assert current.parentEdge is not None
+      assert current.parentEdge.type in [EdgeType.BLOCKED, EdgeType.SELECTED]
+      path.append(current.parent)
+    return path
   
   def getAllLowestLevelFlowers(self) -> List['Flower']:
-    if len(self.innerFlowers) == 0:
-      return [self]
-    
-    result: List['Flower'] = []
-    for inner in self.innerFlowers:
-      result.extend(inner.getAllLowestLevelFlowers())
+    return self.lowestLevelFlowers
 
-    return result
+  def containsVertex(self, vertex: 'Flower') -> bool:
+    if self.isOnlyVertex():
+      return vertex == self
+    return vertex in self.lowestLevelFlowerSet
+
+  def dropLowestLevelFlowers(self) -> None:
+    # The flower has been expanded, it does not contain anything anymore.
+    self.lowestLevelFlowers = []
+    self.lowestLevelFlowerSet = frozenset()
   
   def getAllSuccessors(self) -> list['Flower']:
-    result = [self]
-    for child in self.children:
-      result.extend(child.getAllSuccessors())
-
+    # In preorder, without recursion since the trees can be deep.
+    result: list[Flower] = []
+    stack = [self]
+    while len(stack) > 0:
+      flower = stack.pop()
+      result.append(flower)
+      stack.extend(reversed(flower.children))
     return result
   
   def changeSubtreeIntoDumbbells(self) -> list[Dumbbell]:
-    if self.depth() % 2 == 1:
-      assert len(self.children) == 1
-      assert self.children[0].parentEdge is not None
-      self.parent = None
-      self.children[0].parent = None
-      return [Dumbbell(self, self.children[0], self.children[0].parentEdge)] + self.children[0].changeSubtreeIntoDumbbells()
-    
-    # Otherwise if I am in even depth
+    # Every flower on an odd level forms a dumbbell with its only child.
     result: list[Dumbbell] = []
-    for child in self.children:
-      result.extend(child.changeSubtreeIntoDumbbells())
-
+    stack = [self]
+    while len(stack) > 0:
+      flower = stack.pop()
+      if flower.type == FlowerType.ODD:
+        assert len(flower.children) == 1
+        child = flower.children[0]
+        assert child.parentEdge is not None
+        flower.parent = None
+        child.parent = None
+        result.append(Dumbbell(flower, child, child.parentEdge))
+        stack.append(child)
+      else:
+        stack.extend(reversed(flower.children))
     return result
   
-  def getNoVertexWithZeroCharge(self, level: int) -> Optional['Flower']:
-    if self.charge == 0 and len(self.innerFlowers) > 0 and level % 2 == 1: # Bubbles on even level can't get charge 0
-      return self
-    for child in self.children:
-      response = child.getNoVertexWithZeroCharge(level + 1)
-      if response is not None:
-        return response
-      
-    return None
-  
   def getRoot(self) -> 'Flower':
-    if self.parent is None:
-      return self
-    
-    return self.parent.getRoot()
+    flower = self
+    while flower.parent is not None:
+      flower = flower.parent
+    return flower
   
-  def getMinEpsilon(self, level: int) -> float:
-    epsilon = sys.float_info.max
-    for child in self.children:
-      childEpsilon = child.getMinEpsilon(level + 1)
-      if childEpsilon < epsilon:
-        epsilon = childEpsilon
-
-    if level % 2 == 1 and self.charge < epsilon and len(self.innerFlowers) > 0: # Blue bubbles can have negative charge
-      epsilon = self.charge
-    
-    return epsilon
-
-  def changeChargeByEpsilon(self, level: int, epsilon: float) -> None:
-    if level % 2 == 0:
-      self.charge += epsilon
-    else:
-      self.charge -= epsilon
-
-    for child in self.children:
-      child.changeChargeByEpsilon(level + 1, epsilon)
-
   def getStem(self) -> Flower:
-    if len(self.innerFlowers) == 0:
-      return self
-    
-    return self.innerFlowers[0].getStem()
+    flower = self
+    while len(flower.innerFlowers) > 0:
+      flower = flower.innerFlowers[0]
+    return flower
   
   def changeStemAccordingToEdge(self, edge: Edge) -> None:
+    # On every level the inner flower containing an end of the edge becomes the first one.
+    flower = self
+    while True:
+      for i in range(len(flower.innerFlowers)):
+        if flower.innerFlowers[i].containsVertex(edge.v1) or flower.innerFlowers[i].containsVertex(edge.v2):
+          flower.rotateInnerFlowers(i)
+          flower = flower.innerFlowers[0]
+          break
+      else:
+        return
+
+  def changeStemToVertex(self, vertex: Flower) -> None:
+    # Only rotates the inner flowers of this flower, so the one containing the vertex is the first.
     for i in range(len(self.innerFlowers)):
-      if edge.v1 in self.innerFlowers[i].getAllLowestLevelFlowers() or edge.v2 in self.innerFlowers[i].getAllLowestLevelFlowers():
-        self.innerFlowers = self.innerFlowers[i:] + self.innerFlowers[:i]
-        self.innerFlowers[0].changeStemAccordingToEdge(edge)
+      if self.innerFlowers[i].containsVertex(vertex):
+        self.rotateInnerFlowers(i)
         return
 
+  def rotateInnerFlowers(self, index: int) -> None:
+    self.innerFlowers = self.innerFlowers[index:] + self.innerFlowers[:index]
+    self.innerEdges = self.innerEdges[index:] + self.innerEdges[:index]
+
 
 class Edge:
+  __slots__ = ('v1', 'v2', 'capacity', 'type', 'id', 'eventStamp')
   v1: Flower
   v2: Flower
   capacity: float
-  textRepr: str
   type: EdgeType
+  id: int # Index of the edge in the instance
+  eventStamp: int
 
-  def __init__(self, v1: Flower, v2: Flower, capacity: float, textRepr: str, type: EdgeType):
+  def __init__(self, v1: Flower, v2: Flower, capacity: float, type: EdgeType, id: int):
     self.v1 = v1
     self.v2 = v2
     self.capacity = capacity
-    self.textRepr = textRepr
     self.type = type
+    self.id = id
+    self.eventStamp = 0
 
-  def getCurrentCharge(self) -> float:
-    return self.v1.getTotalCharge(self.v2) + self.v2.getTotalCharge(self.v1)
+  def getCurrentCharge(self, globalDelta: float) -> float:
+    return self.v1.getTotalCharge(self.v2, globalDelta) + self.v2.getTotalCharge(self.v1, globalDelta)
   
-  def getEpsilon(self) -> float:
-    return self.capacity - self.getCurrentCharge()
+  def getEpsilon(self, globalDelta: float) -> float:
+    return self.capacity - self.getCurrentCharge(globalDelta)
+
+  @property
+  def textRepr(self) -> str:
+    return f"{self.v1.textRepr} {self.v2.textRepr}"
   
   def __str__(self) -> str:
     return self.textRepr
@@ -249,6 +299,7 @@ class Edge:
 
 
 class Dumbbell:
+  __slots__ = ('f1', 'f2', 'edge')
   f1: Flower
   f2: Flower
   edge: Edge
@@ -260,6 +311,10 @@ class Dumbbell:
     self.f1 = f1
     self.f2 = f2
     self.edge = edge
+    for flower in [f1, f2]:
+      flower.type = FlowerType.DUMBBELL
+      flower.tree = None
+      flower.dumbbell = self
     self.changeStemsInInner()
 
   def makeIntoSubTree(self, edge: Edge) -> Flower:
@@ -271,13 +326,19 @@ class Dumbbell:
       endVertexOuter = endVertex.getTotalOuterFlower()
     
     # Find out what is the flower conencted by the edge
+    self.f1.dumbbell = None
+    self.f2.dumbbell = None
     if endVertexOuter == self.f1:
+      self.f1.type = FlowerType.ODD
+      self.f2.type = FlowerType.EVEN
       self.f1.children = [self.f2]
       self.f2.children = []
       self.f2.parent = self.f1
       self.f2.parentEdge = self.edge
       return self.f1
     elif endVertexOuter == self.f2:
+      self.f2.type = FlowerType.ODD
+      self.f1.type = FlowerType.EVEN
       self.f2.children = [self.f1]
       self.f1.children = []
       self.f1.parent = self.f2
@@ -0,0 +1,6 @@
+from enum import Enum
+
+class EventType(Enum):
+  EVEN_EVEN_EDGE = 1
+  EVEN_DUMBBELL_EDGE = 2
+  ODD_BLOSSOM = 3
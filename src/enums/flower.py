@@ -0,0 +1,7 @@
+from enum import Enum
+
+class FlowerType(Enum):
+  EVEN = 1 # In a tree on an even level
+  ODD = 2 # In a tree on an odd level
+  DUMBBELL = 3
+  INNER = 4 # Inside some other flower
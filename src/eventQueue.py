@@ -0,0 +1,60 @@
+from __future__ import annotations
+import heapq
+import itertools
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from src.dataStructures import Edge, Flower
+from src.enums.event import EventType
+
+
+EventItem = Union[Edge, Flower]
+Entry = Tuple[float, int, int, EventItem]
+
+
+class EventQueue:
+  """
+  Priority queues of everything which can stop a dual step: edges between two flowers on an even level,
+  edges between a flower on an even level and a dumbbell, and blossoms on an odd level.
+
+  The key of every entry is the total epsilon (sum of all the dual steps so far) at which the event happens.
+  Since the slack of a scheduled item changes at the same rate as the total epsilon, the keys never have
+  to be updated. Entries are invalidated lazily - only the entry with the latest stamp of its item is valid.
+  """
+  queues: Dict[EventType, List[Entry]]
+  counter: Iterator[int]
+
+  def __init__(self) -> None:
+    self.queues = {eventType: [] for eventType in EventType}
+    self.counter = itertools.count()
+
+  def push(self, eventType: EventType, item: EventItem, key: float) -> None:
+    item.eventStamp += 1
+    heapq.heappush(self.queues[eventType], (key, next(self.counter), item.eventStamp, item))
+
+  def discard(self, item: EventItem) -> None:
+    item.eventStamp += 1
+
+  def peek(self) -> Optional[Tuple[float, EventType, EventItem]]:
+    result: Optional[Tuple[float, EventType, EventItem]] = None
+    for eventType, queue in self.queues.items():
+      while len(queue) > 0 and not EventQueue.isValid(queue[0]):
+        heapq.heappop(queue)
+      if len(queue) > 0 and (result is None or queue[0][0] < result[0]):
+        result = (queue[0][0], eventType, queue[0][3])
+
+    return result
+
+  def pop(self, eventType: EventType) -> EventItem:
+    _, _, _, item = heapq.heappop(self.queues[eventType])
+    self.discard(item)
+    return item
+
+  @staticmethod
+  def isValid(entry: Entry) -> bool:
+    _, _, stamp, item = entry
+    if stamp != item.eventStamp:
+      return False
+    # Edges which ended up inside one blossom after P3 are not rescheduled, so drop them here.
+    if isinstance(item, Edge):
+      return item.v1.getTotalOuterFlower() != item.v2.getTotalOuterFlower()
+    return True
@@ -0,0 +1,46 @@
+from typing import List
+
+import numpy as np
+import numpy.typing as npt
+
+
+class Graph:
+  """
+  Compact storage of the input graph. Endpoints (0-based vertex indices) and capacities of the edges are kept
+  in typed arrays indexed by the edge id, the adjacency is in CSR form - the ids of the edges of the vertex v
+  are adjacency[offsets[v]:offsets[v+1]].
+  """
+  vertexCount: int
+  endpoints: npt.NDArray[np.int32] # Shape (number of edges, 2)
+  capacities: npt.NDArray[np.float64]
+  offsets: npt.NDArray[np.int64]
+  adjacency: npt.NDArray[np.int32]
+
+  def __init__(self, vertexCount: int, endpoints: npt.ArrayLike, capacities: npt.ArrayLike) -> None:
+    self.vertexCount = vertexCount
+    self.endpoints = np.asarray(endpoints, dtype=np.int32).reshape(-1, 2)
+    self.capacities = np.asarray(capacities, dtype=np.float64).reshape(-1)
+    if len(self.endpoints) != len(self.capacities):
+      raise ValueError("Every edge needs both endpoints and a capacity")
+    if len(self.endpoints) > 0 and (self.endpoints.min() < 0 or self.endpoints.max() >= vertexCount):
+      raise ValueError("Endpoint of an edge is not a vertex of the graph")
+    if np.any(self.endpoints[:, 0] == self.endpoints[:, 1]):
+      raise ValueError("Loops are not allowed")
+
+    # Every edge is listed at both of its endpoints, a stable sort keeps the edges of a vertex ordered by id.
+    ends = self.endpoints.reshape(-1)
+    order = np.argsort(ends, kind='stable')
+    self.adjacency = (order // 2).astype(np.int32)
+    self.offsets = np.zeros(vertexCount + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=vertexCount), out=self.offsets[1:])
+
+  @property
+  def edgeCount(self) -> int:
+    return len(self.capacities)
+
+  def getLabels(self, edgeIds: npt.ArrayLike) -> List[str]:
+    return [f"{u + 1} {v + 1}" for u, v in self.endpoints[np.asarray(edgeIds, dtype=np.intp)].tolist()]
+
+  def getSlacks(self, vertexCharges: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    # How much every edge can still take with these charges of the vertices and no blossoms.
+    return self.capacities - vertexCharges[self.endpoints[:, 0]] - vertexCharges[self.endpoints[:, 1]]
@@ -1,81 +1,456 @@
-from re import A
-from typing import List
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
 from src.dataStructures import Dumbbell, Edge, Flower, Tree
 from src.enums.edge import EdgeType
-from src.utils.alternatingPath import findAlternatingPath, findSubtrees, getVerticesOnAlternatingPath
+from src.enums.event import EventType
+from src.enums.flower import FlowerType
+from src.eventQueue import EventItem, EventQueue
+from src.graph import Graph
+from src.stats import Stats
+from src.utils.alternatingPath import findAlternatingPath, findSubtrees
 from src.utils.edge import findConnectingEdge
-from src.utils.epsilon import calculateEpsilon
-from src.utils.typeOfFlower import isInTreeOnEvenDepth
+from src.utils.epsilon import getNextEvent, halve, scheduleEdge, scheduleFlower
+
+if TYPE_CHECKING:
+  from src.budget import Budget
+  from src.checkpoint import Checkpoint
 
 
 class Instance:
-  trees: List[Tree]
-  dumbbells: List[Dumbbell]
-  selectedEdges: List[Edge]
-  blockingEdges: List[Edge]
-  otherEdges: List[Edge]
+  trees: Dict[int, Tree] # Keyed by id() of the tree, so it can be removed in O(1) and the order stays the same
+  dumbbells: Dict[int, Dumbbell] # Keyed by id() of the dumbbell, like the trees
+  vertices: List[Flower] # All the vertices, indexed by their id
+  edges: List[Edge] # All the edges, indexed by their id
+  selectedEdges: Dict[int, Edge]
+  blockingEdges: Dict[int, Edge]
+  edgeTypes: npt.NDArray[np.int8] # Value of EdgeType of every edge by its id, 0 for deleted edges, can be longer than edges
+  events: EventQueue
+  globalDelta: float # Sum of all epsilons so far
+  stats: Optional[Stats] # Filled during the run if set
+  scale: int # Capacities and charges are multiplied by it, 2 in the integer mode
+  perfect: bool # If not set, vertices can stay unmatched and the matching of minimum cost of any size is found
 
   def __init__(self) -> None:
-    self.trees = []
-    self.dumbbells = []
-    self.selectedEdges = []
-    self.blockingEdges = []
-    self.otherEdges = []
+    self.trees = {}
+    self.dumbbells = {}
+    self.vertices = []
+    self.edges = []
+    self.selectedEdges = {}
+    self.blockingEdges = {}
+    self.edgeTypes = np.zeros(0, dtype=np.int8)
+    self.events = EventQueue()
+    self.globalDelta = 0
+    self.stats = None
+    self.scale = 1
+    self.perfect = True
+
+  @staticmethod
+  def fromGraph(graph: Graph, integer: bool = False, perfect: bool = True) -> 'Instance':
+    """
+    In the integer mode all the capacities are doubled integers, so every charge and epsilon is an exact integer
+    as well, even the half of what an edge between two flowers on even levels can take.
+
+    Without a perfect matching, the total charge of every vertex has to stay at most 0. All the vertices start with
+    half of the cheapest capacity, or 0, and the run stops when the unmatched vertices get to 0. With capacities
+    being negated weights, this is the maximum weight matching without doubling the graph.
+    """
+    result = Instance()
+    for i in range(graph.vertexCount):
+      result.addVertex()
+
+    capacities: List[float] = graph.capacities.tolist()
+    if integer:
+      result.scale = 2
+      capacities = [result.scaleCapacity(capacity) for capacity in capacities]
+    vertices = result.vertices
+    result.edges = [Edge(vertices[u], vertices[v], capacities[id], EdgeType.OTHER, id) for id, (u, v) in enumerate(graph.endpoints.tolist())]
+    result.edgeTypes = np.full(graph.edgeCount, EdgeType.OTHER.value, dtype=np.int8)
+    # The edges of a vertex are a slice of the edges in the order of the adjacency, so its list has no spare room.
+    incidentEdges = [result.edges[id] for id in graph.adjacency.tolist()]
+    offsets = graph.offsets.tolist()
+    for vertex in vertices:
+      vertex.edges = incidentEdges[offsets[vertex.id]:offsets[vertex.id + 1]]
+
+    if not perfect:
+      result.perfect = False
+      start = halve(min([0] + capacities))
+      for vertex in result.vertices:
+        vertex.charge = start
+    return result
 
   def action(self) -> None:
-    # First change the epsilon, if epsilon is 0, some action has to be performed.
-    epsilon: float = calculateEpsilon(self.trees, self.otherEdges, self.dumbbells)
-    treeRoots = list(map(lambda x: x.root, self.trees))
-
-    if epsilon > 0:
-      # Change the charges
-      for root in treeRoots:
-        root.changeChargeByEpsilon(0, epsilon)
-    else:
-      # Move through the instance, find out if something has to be done, if yes, perform it
-      # If some not-vertex bubble in some tree has charge 0, perform P1.
-      for tree in self.trees:
-        flower = tree.getNoVertexWithZeroCharge()
-        if flower is not None:
-          self.P1(flower)
-          return
-      
-      for edge in self.otherEdges:
-        if edge.getCurrentCharge() >= edge.capacity:
-          outerFlower1 = edge.v1.getTotalOuterFlower()
-          outerFlower2 = edge.v2.getTotalOuterFlower()
-
-          # If at least one of the flowers is not in a tree on even level, skip this action and try again
-          if not isInTreeOnEvenDepth(outerFlower1, treeRoots) and not isInTreeOnEvenDepth(outerFlower2, treeRoots):
-            continue
-
-          # If some edge is full between some bubble on an even level and a dumbbell, perform P2.
-          for dumbbell in self.dumbbells:
-            if dumbbell.containsFlower(outerFlower1) and isInTreeOnEvenDepth(outerFlower2, treeRoots):
-              # Meaning that the other flower is on even level
-              self.P2(outerFlower2, dumbbell, edge)
-              return
-            elif dumbbell.containsFlower(outerFlower2) and isInTreeOnEvenDepth(outerFlower1, treeRoots):
-              self.P2(outerFlower1, dumbbell, edge)
-              return
-            
-          # If some edge between flowers in one tree has been filled, perform P3.
-          if outerFlower1.getRoot() == outerFlower2.getRoot() and outerFlower1.depth() % 2 == 0 and outerFlower2.depth() % 2 == 0:
-            self.P3(edge)
-            return
-
-          # Otherwise perform P4
-          if isInTreeOnEvenDepth(outerFlower1, treeRoots) and isInTreeOnEvenDepth(outerFlower2, treeRoots):
-            self.P4(edge)
-            return    
-
-  def run(self) -> None:
+    """
+    Performs one dual step, which changes the charges until the first event happens, and then the primitives for all
+    the events which happen at the same time, without another dual step in between. The queue checks every event
+    again when it comes to the top, since the primitives before it can change the structure.
+    """
+    # The dual step is finding the next event and moving the global delta to it.
+    start = time.perf_counter() if self.stats is not None else 0.0
+    if not self.perfect:
+      # The charges of all the unmatched vertices are the same and grow the fastest, so they get to 0 first.
+      nextEvent = self.events.peek()
+      stopDelta = self.getStopDelta()
+      if nextEvent is None or nextEvent[0] >= stopDelta:
+        epsilon = stopDelta - self.globalDelta
+        self.globalDelta = max(self.globalDelta, stopDelta)
+        if epsilon > 0 and self.stats is not None:
+          self.stats.recordEpsilon(epsilon / self.scale)
+          self.stats.recordAction("dual step", time.perf_counter() - start, self)
+        return
+
+    eventTime, _, _ = getNextEvent(self.events)
+    if eventTime > self.globalDelta:
+      # Change the charges, flowers in trees compute their charges from the global delta.
+      epsilon = eventTime - self.globalDelta
+      self.globalDelta = eventTime
+      if self.stats is not None:
+        self.stats.recordEpsilon(epsilon / self.scale)
+        self.stats.recordAction("dual step", time.perf_counter() - start, self)
+
+    nextEvent = self.events.peek()
+    while nextEvent is not None and nextEvent[0] <= self.globalDelta and len(self.trees) > 0:
+      _, eventType, item = nextEvent
+      self.events.pop(eventType)
+      if self.stats is None:
+        self.performEvent(eventType, item)
+      else:
+        start = time.perf_counter()
+        primitive = self.performEvent(eventType, item)
+        self.stats.recordAction(primitive, time.perf_counter() - start, self)
+      nextEvent = self.events.peek()
+
+  def performEvent(self, eventType: EventType, item: EventItem) -> str:
+    # If some not-vertex bubble in some tree has charge 0, perform P1.
+    if eventType == EventType.ODD_BLOSSOM:
+      assert isinstance(item, Flower)
+      self.P1(item)
+      return "P1"
+
+    assert isinstance(item, Edge)
+    assert item.getCurrentCharge(self.globalDelta) >= item.capacity
+    outerFlower1 = item.v1.getTotalOuterFlower()
+    outerFlower2 = item.v2.getTotalOuterFlower()
+
+    # If some edge is full between some bubble on an even level and a dumbbell, perform P2.
+    if eventType == EventType.EVEN_DUMBBELL_EDGE:
+      if outerFlower1.dumbbell is not None:
+        self.P2(outerFlower2, outerFlower1.dumbbell, item)
+      else:
+        assert outerFlower2.dumbbell is not None
+        self.P2(outerFlower1, outerFlower2.dumbbell, item)
+      return "P2"
+
+    # If some edge between flowers in one tree has been filled, perform P3.
+    if outerFlower1.tree == outerFlower2.tree:
+      self.P3(item)
+      return "P3"
+
+    # Otherwise perform P4
+    self.P4(item)
+    return "P4"
+
+  def run(self, warmStart: bool = False, checkpoint: Optional[Checkpoint] = None, budget: Optional[Budget] = None) -> bool:
+    """
+    Returns whether the run is finished, then the matching is perfect, or optimal without a perfect matching. With
+    a budget the run can stop earlier, between two actions, and can be continued later by running again.
+    """
+    if warmStart:
+      if not self.perfect:
+        raise ValueError("The warm start needs a perfect matching")
+      self.warmStart()
+    if self.scale != 1:
+      self.alignTreeChargeParity()
+    self.scheduleAll()
     # Repeat until all instances are dumbbells
-    while len(self.trees) > 0:
+    while not self.isFinished():
+      if budget is not None and budget.isExhausted():
+        break
       self.action()
-    
+      if checkpoint is not None:
+        checkpoint.update(self)
+      if budget is not None:
+        budget.update()
+
+    if budget is not None:
+      budget.finish(self)
+    return self.isFinished()
+
+  def getStopDelta(self) -> float:
+    # The global delta at which the charges of the unmatched vertices get to 0, they are the stems of the roots.
+    if len(self.trees) == 0:
+      return self.globalDelta
+    return self.globalDelta - self.getVertexCharge(next(iter(self.trees.values())).root.getStem())
+
+  def isFinished(self) -> bool:
+    return len(self.trees) == 0 or (not self.perfect and self.getStopDelta() <= self.globalDelta)
+
+  def warmStart(self) -> None:
+    """
+    Sets the initial charges and matching greedily, before the first dual step. Every vertex gets half of the capacity
+    of its cheapest edge. Then every vertex which is not matched yet takes the smallest epsilon of its edges, and if
+    this fills an edge to a vertex which is not matched either, the two vertices are matched into a dumbbell.
+    The charges stay feasible the whole time, so the algorithm continues as if it found these dumbbells itself.
+    """
+    if self.globalDelta != 0 or len(self.dumbbells) > 0:
+      raise ValueError("The warm start is only possible before the first run")
+
+    for vertex in self.vertices:
+      if len(vertex.edges) > 0:
+        vertex.charge = halve(min(edge.capacity for edge in vertex.edges))
+
+    matched: Set[Flower] = set()
+    for vertex in self.vertices:
+      if vertex in matched or len(vertex.edges) == 0:
+        continue
+      vertex.charge += min(edge.getEpsilon(self.globalDelta) for edge in vertex.edges)
+
+      for edge in vertex.edges:
+        other = edge.v2 if edge.v1 == vertex else edge.v1
+        if other not in matched and edge.getEpsilon(self.globalDelta) <= 0:
+          self.setEdgeType(edge, EdgeType.SELECTED)
+          self.addDumbbell(Dumbbell(vertex, other, edge))
+          matched.update([vertex, other])
+          break
+
+    self.trees = {key: tree for key, tree in self.trees.items() if tree.root.dumbbell is None}
+
+  def scheduleAll(self) -> None:
+    for tree in self.trees.values():
+      for flower in tree.root.getAllSuccessors():
+        self.updateChargeDirection(flower)
+    for edge in self.getOtherEdges():
+      scheduleEdge(edge, self.events, self.globalDelta)
+    for tree in self.trees.values():
+      for flower in tree.root.getAllSuccessors():
+        if not flower.isOnlyVertex():
+          scheduleFlower(flower, self.events, self.globalDelta)
+
+  def scheduleFlowers(self, flowers: List[Flower]) -> None:
+    for flower in flowers:
+      self.updateChargeDirection(flower)
+      scheduleFlower(flower, self.events, self.globalDelta)
+
+  def updateChargeDirection(self, flower: Flower) -> None:
+    # Flowers on even levels get the epsilon, on odd levels they lose it and the rest keeps its charge.
+    if flower.type == FlowerType.EVEN:
+      flower.setChargeDirection(1, self.globalDelta)
+    elif flower.type == FlowerType.ODD:
+      flower.setChargeDirection(-1, self.globalDelta)
+    else:
+      flower.setChargeDirection(0, self.globalDelta)
+
+  def addVertex(self) -> Flower:
+    # Every vertex starts as a tree of its own.
+    vertex = self.createVertex()
+    self.addTree(Tree(vertex))
+    return vertex
+
+  def addTree(self, tree: Tree) -> None:
+    self.trees[id(tree)] = tree
+
+  def addDumbbell(self, dumbbell: Dumbbell) -> None:
+    self.dumbbells[id(dumbbell)] = dumbbell
+
+  def createVertex(self) -> Flower:
+    vertex = Flower(None, None, [], [], [])
+    vertex.id = len(self.vertices)
+    self.vertices.append(vertex)
+    return vertex
+
+  def addEdge(self, edge: Edge) -> None:
+    assert edge.id == len(self.edges)
+    self.edges.append(edge)
+    if edge.id >= len(self.edgeTypes):
+      # Doubled, so that adding the edges one by one takes amortized constant time.
+      self.edgeTypes = np.concatenate([self.edgeTypes, np.zeros(max(16, len(self.edgeTypes)), dtype=np.int8)])
+    self.edgeTypes[edge.id] = edge.type.value
+    if edge.type != EdgeType.OTHER:
+      self.getEdgesOfType(edge.type)[edge.id] = edge
+    edge.v1.edges.append(edge)
+    edge.v2.edges.append(edge)
+
+  def getEdgesOfType(self, type: EdgeType) -> Dict[int, Edge]:
+    # Only the selected and blocking edges are kept in dicts, there are at most as many of them as vertices.
+    assert type != EdgeType.OTHER
+    return self.selectedEdges if type == EdgeType.SELECTED else self.blockingEdges
+
+  def getOtherEdges(self) -> List[Edge]:
+    return [self.edges[id] for id in np.flatnonzero(self.edgeTypes[:len(self.edges)] == EdgeType.OTHER.value).tolist()]
+
+  def setEdgeType(self, edge: Edge, type: EdgeType) -> None:
+    if edge.type != EdgeType.OTHER:
+      del self.getEdgesOfType(edge.type)[edge.id]
+    if type != EdgeType.OTHER:
+      self.getEdgesOfType(type)[edge.id] = edge
+    edge.type = type
+    self.edgeTypes[edge.id] = type.value
+
+  def getVertexCharges(self) -> npt.NDArray[np.float64]:
+    # Total charge of every vertex, including the charges of all the flowers containing it.
+    charges = np.array([self.getVertexCharge(vertex) for vertex in self.vertices], dtype=np.float64)
+    return charges / self.scale
+
+  def getVertexCharge(self, vertex: Flower) -> float:
+    charge: float = 0
+    flower: Optional[Flower] = vertex
+    while flower is not None:
+      charge += flower.getCharge(self.globalDelta)
+      flower = flower.outerFlower
+    return charge
+
+  def getAllFlowers(self) -> List[Flower]:
+    # The vertices first, then all the blossoms, every one of them after all of its inner flowers.
+    flowers = list(self.vertices)
+    seen = set(flowers)
+    for vertex in self.vertices:
+      outerFlower = vertex.getTotalOuterFlower()
+      if outerFlower in seen:
+        continue
+      stack = [(outerFlower, False)]
+      while len(stack) > 0:
+        flower, expanded = stack.pop()
+        if expanded:
+          flowers.append(flower)
+          seen.add(flower)
+        elif flower not in seen:
+          stack.append((flower, True))
+          stack.extend((inner, False) for inner in reversed(flower.innerFlowers))
+    return flowers
+
+  def getDualObjective(self) -> float:
+    # Sum of the charges of all the flowers. The charges are a feasible dual solution at any time, so this is a lower
+    # bound on the weight of every perfect matching.
+    return sum(flower.getCharge(self.globalDelta) for flower in self.getAllFlowers()) / self.scale
+
+  def exportDuals(self) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+    """
+    The dual solution as a laminar family: the nodes are the vertices with their ids followed by the blossoms, every
+    blossom after its inner flowers. Returns the parent node of every node, -1 for the outermost ones, and the charges.
+    """
+    flowers = self.getAllFlowers()
+    ids: Dict[Flower, int] = {flower: id for id, flower in enumerate(flowers)}
+    parents = np.array([ids[flower.outerFlower] if flower.outerFlower is not None else -1 for flower in flowers], dtype=np.int64)
+    charges = np.array([flower.getCharge(self.globalDelta) for flower in flowers], dtype=np.float64)
+    return parents, charges / self.scale
+
+  def makeEdgeOther(self, edge: Edge) -> None:
+    # A blocking edge, which does not connect a flower to its parent or two inner flowers, is not full anymore.
+    assert edge.type == EdgeType.BLOCKED
+    self.setEdgeType(edge, EdgeType.OTHER)
+
+  def changeEdgeCapacity(self, id: int, capacity: float) -> None:
+    """
+    Changes the capacity of an edge before or after a run. Only the dumbbells which depend on the edge are dissolved
+    back into trees, so the next run continues from the current charges and matching.
+    """
+    self.checkCanChange()
+    edge = self.edges[id]
+    capacity = self.scaleCapacity(capacity)
+    if edge.type != EdgeType.OTHER and capacity != edge.capacity:
+      # The edge is not full anymore, or it is overfilled.
+      self.dissolve(edge.v1)
+
+    edge.capacity = capacity
+    self.repairEdge(edge)
+
+  def insertEdge(self, vertex1: int, vertex2: int, capacity: float) -> int:
+    self.checkCanChange()
+    edge = Edge(self.vertices[vertex1], self.vertices[vertex2], self.scaleCapacity(capacity), EdgeType.OTHER, len(self.edges))
+    self.addEdge(edge)
+    self.repairEdge(edge)
+    return edge.id
+
+  def deleteEdge(self, id: int) -> None:
+    # The edge stays in edges so that the ids of the others do not change, but it is not in any other list.
+    self.checkCanChange()
+    edge = self.edges[id]
+    if edge.type != EdgeType.OTHER:
+      self.dissolve(edge.v1)
+
+    self.edgeTypes[id] = 0
+    edge.v1.edges.remove(edge)
+    edge.v2.edges.remove(edge)
+    self.events.discard(edge)
+
+  def checkCanChange(self) -> None:
+    if not self.perfect:
+      raise ValueError("The graph can only be changed when looking for a perfect matching")
+    for tree in self.trees.values():
+      if len(tree.root.children) > 0 or not tree.root.isOnlyVertex():
+        raise ValueError("The graph can only be changed before or after a run")
+
+  def repairEdge(self, edge: Edge) -> None:
+    # If the edge is overfilled, the dumbbell of one of its ends is dissolved, which can only free some charge.
+    # The rest is taken from the vertex, charges of vertices can be negative.
+    if edge.getEpsilon(self.globalDelta) >= 0:
+      return
+
+    self.dissolve(edge.v1)
+    epsilon = edge.getEpsilon(self.globalDelta)
+    if epsilon < 0:
+      edge.v1.charge += epsilon
+
+  def scaleCapacity(self, capacity: float) -> float:
+    if self.scale == 1:
+      return capacity
+    if not float(capacity).is_integer():
+      raise ValueError(f"The capacity {capacity} is not an integer, which the integer mode needs")
+    return int(capacity) * self.scale
+
+  def alignTreeChargeParity(self) -> None:
+    """
+    In the integer mode the charges of all the vertices in trees have to be of the same parity, then every edge
+    between two flowers on even levels can take an even amount and its half is an integer. Tight edges keep the parity
+    of the flowers they attach, so it only has to be set for the trees of single vertices before a run - to the parity
+    of the other trees, or even if there are none. Lowering the charges keeps them feasible.
+    """
+    parity: float = 0
+    for tree in self.trees.values():
+      if not tree.root.isOnlyVertex() or len(tree.root.children) > 0:
+        parity = self.getVertexCharge(tree.root.getStem()) % 2
+        break
+
+    for tree in self.trees.values():
+      if tree.root.isOnlyVertex() and len(tree.root.children) == 0:
+        tree.root.setChargeDirection(0, self.globalDelta)
+        tree.root.charge -= (tree.root.charge - parity) % 2
+
+  def dissolve(self, vertex: Flower) -> None:
+    """
+    Turns the dumbbell containing the vertex back into trees of single vertices. The blossoms in it are dropped
+    together with their charges, which only makes the edges leaving them less full, so the charges stay feasible.
+    """
+    dumbbell = vertex.getTotalOuterFlower().dumbbell
+    if dumbbell is None:
+      return
+
+    del self.dumbbells[id(dumbbell)]
+    self.setEdgeType(dumbbell.edge, EdgeType.OTHER)
+    for outerFlower in [dumbbell.f1, dumbbell.f2]:
+      stack = [outerFlower]
+      while len(stack) > 0:
+        flower = stack.pop()
+        for innerEdge in flower.innerEdges:
+          self.setEdgeType(innerEdge, EdgeType.OTHER)
+        stack.extend(flower.innerFlowers)
+        self.events.discard(flower)
+
+      for lowestLevelFlower in outerFlower.getAllLowestLevelFlowers():
+        lowestLevelFlower.setChargeDirection(0, self.globalDelta)
+        lowestLevelFlower.outerFlower = None
+        lowestLevelFlower.totalOuterFlower = lowestLevelFlower
+        lowestLevelFlower.parent = None
+        lowestLevelFlower.parentEdge = None
+        lowestLevelFlower.children = []
+        lowestLevelFlower.dumbbell = None
+        self.addTree(Tree(lowestLevelFlower))
+
   def P1(self, flower: Flower) -> None:
-    print(f"P1 on {flower.getAllLowestLevelFlowers()}")
     """
     Performs an action, where for a flower on odd level the charge fell to 0. The steps are mentioned below.
 
@@ -96,8 +471,7 @@ class Instance:
     flowerIndexToParent = 0
     assert flower.parentEdge is not None
     for inner in flower.innerFlowers:
-      lowLevelFlowers = inner.getAllLowestLevelFlowers()
-      if flower.parentEdge.v1 in lowLevelFlowers or flower.parentEdge.v2 in lowLevelFlowers:
+      if inner.containsVertex(flower.parentEdge.v1) or inner.containsVertex(flower.parentEdge.v2):
         break
       flowerIndexToParent += 1
 
@@ -109,22 +483,24 @@ class Instance:
     # Get the path with the odd length. It should be from K{i+1} to K1.
     # If i+1 is odd (i is even), then the path is K{i+1}, K{i}, ..., K1 and the path of new dumbbells is K{i+2}, ..., K{t}
     # If i+1 is even, then it is K{i+1}, K{i+2}, ..., Kt, K1 where Kt is the last inner flower and the path of dumbbells is K2, ..., Ki
-    newPath: List[Flower]
-    dumbbellPath: List[Flower]
+    # The rest of the cycle goes from K{i+1} to K1 and the new dumbbells are the flowers between them.
+    count = len(flower.innerFlowers)
+    newPathIndices: List[int]
+    cycleRestIndices: List[int]
     if flowerIndexToParent % 2 == 0:
-      newPath = flower.innerFlowers[:flowerIndexToParent+1]
-      newPath.reverse()
-      dumbbellPath = flower.innerFlowers[flowerIndexToParent+1:]
+      newPathIndices = list(range(flowerIndexToParent, -1, -1))
+      cycleRestIndices = list(range(flowerIndexToParent, count)) + [0]
     else:
-      newPath = flower.innerFlowers[flowerIndexToParent:] + [flower.innerFlowers[0]]
-      dumbbellPath = flower.innerFlowers[1:flowerIndexToParent]
+      newPathIndices = list(range(flowerIndexToParent, count)) + [0]
+      cycleRestIndices = list(range(flowerIndexToParent, -1, -1))
+    newPath = [flower.innerFlowers[i] for i in newPathIndices]
 
     # Change the odd path for the flower in the tree, change the child of the parent to Kt and
     # change the parent of the child to K1
     for i in range(len(newPath) - 1):
       newPath[i].children = [newPath[i+1]]
       newPath[i+1].parent = newPath[i]
-      newPath[i+1].parentEdge = findConnectingEdge(newPath[i+1], newPath[i], self.blockingEdges + self.selectedEdges)
+      newPath[i+1].parentEdge = findConnectingEdge(flower, newPathIndices[i], newPathIndices[i+1])
 
     newPath[0].parent = flower.parent
     newPath[0].parentEdge = flower.parentEdge
@@ -140,25 +516,27 @@ class Instance:
     # For each of the inner flowers, set outerFlower to None
     for inner in flower.innerFlowers:
       inner.outerFlower = None
+      inner.setTotalOuterFlower(inner)
+
+    # The new path starts and ends on an odd level, like the flower did.
+    for i in range(len(newPath)):
+      newPath[i].type = FlowerType.ODD if i % 2 == 0 else FlowerType.EVEN
+      newPath[i].tree = flower.tree
 
     # Find the dumbbells on the even path, and put them into new dumbbells
-    for i in range(0, len(dumbbellPath), 2):
-      self.dumbbells.append(Dumbbell(dumbbellPath[i], dumbbellPath[i+1], findConnectingEdge(dumbbellPath[i], dumbbellPath[i+1], self.selectedEdges)))
-      
-    # Unblock the two connecting edges to a new dumbbell
-    if len(dumbbellPath) > 0:
-      e1 = findConnectingEdge(dumbbellPath[0], newPath[0], self.blockingEdges)
-      e1.type = EdgeType.OTHER
-      self.blockingEdges.remove(e1)
-      self.otherEdges.append(e1)
-
-      e2 = findConnectingEdge(dumbbellPath[-1], newPath[-1], self.blockingEdges)
-      e2.type = EdgeType.OTHER
-      self.blockingEdges.remove(e2)
-      self.otherEdges.append(e2)
+    for i in range(1, len(cycleRestIndices) - 1, 2):
+      first, second = cycleRestIndices[i], cycleRestIndices[i+1]
+      self.addDumbbell(Dumbbell(flower.innerFlowers[first], flower.innerFlowers[second], findConnectingEdge(flower, first, second)))
+
+    # Unblock the edges connecting the new dumbbells to the new path and to each other. If there are no new
+    # dumbbells, this is the edge between the ends of the new path.
+    for i in range(0, len(cycleRestIndices) - 1, 2):
+      self.makeEdgeOther(findConnectingEdge(flower, cycleRestIndices[i], cycleRestIndices[i+1]))
+
+    flower.dropLowestLevelFlowers()
+    self.scheduleFlowers(flower.innerFlowers)
 
   def P2(self, flower: Flower, dumbbell: Dumbbell, edge: Edge) -> None:
-    print(f"P2 on {flower} {dumbbell} and edge {edge}")
     """
     Connects a dumbbell to a flower in some tree.
 
@@ -168,10 +546,10 @@ class Instance:
     jedného syna H2 (na párnej úrovni).
     """
 
-    assert flower.depth() % 2 == 0
+    assert flower.type == FlowerType.EVEN
 
     # Remove the dumbbell from dumbbells.
-    self.dumbbells.remove(dumbbell)
+    del self.dumbbells[id(dumbbell)]
 
     # Transform the dumbbell into a subtree.
     subtree: Flower = dumbbell.makeIntoSubTree(edge)
@@ -180,14 +558,15 @@ class Instance:
     flower.children.append(subtree)
     subtree.parent = flower
     subtree.parentEdge = edge
+    dumbbell.f1.tree = flower.tree
+    dumbbell.f2.tree = flower.tree
 
     # Add the edge to blocking
-    self.blockingEdges.append(edge)
-    self.otherEdges.remove(edge)
-    edge.type = EdgeType.BLOCKED
+    self.setEdgeType(edge, EdgeType.BLOCKED)
+
+    self.scheduleFlowers([dumbbell.f1, dumbbell.f2])
 
   def P3(self, edge: Edge) -> None:
-    print(f"P3 on {edge}")
     """
     Naplnila sa hrana spájajúca kvety K a H v jednom strome. Zjavne K aj H sú na párnej úrovni. Nech W je LCA 
     K a H. Keďže W má aspoň 2 synov, musí byť tiež na párnej úrovni. Nech K, K1, ... K2k+1, W a H, H1, ... H2r+1, W
@@ -195,14 +574,12 @@ class Instance:
     úrovni, ktorého stopka je stopka W. Synovia Z budú všetci synovia zahrnutých kvetov. Títo ostanú na nepárnej úrovni.
     """
 
-    edge.type = EdgeType.BLOCKED
-    self.blockingEdges.append(edge)
-    self.otherEdges.remove(edge)
+    self.setEdgeType(edge, EdgeType.BLOCKED)
 
     K = edge.v1.getTotalOuterFlower()
     H = edge.v2.getTotalOuterFlower()
 
-    if K.depth() % 2 != 0 or H.depth() % 2 != 0:
+    if K.type != FlowerType.EVEN or H.type != FlowerType.EVEN:
       raise ValueError("One of the flowers is not on even level")
     
     # Find LCA of K and H
@@ -216,6 +593,16 @@ class Instance:
     KtoW = KtoW[:-1]
     innerFlowers: List[Flower] = WtoH + KtoW
 
+    # The edges between the inner flowers are the edges to their parents, only H and K are connected by the new edge.
+    innerEdges: List[Edge] = []
+    for flower in WtoH[1:]:
+      assert flower.parentEdge is not None
+      innerEdges.append(flower.parentEdge)
+    innerEdges.append(edge)
+    for flower in KtoW:
+      assert flower.parentEdge is not None
+      innerEdges.append(flower.parentEdge)
+
     # Get the list of all the children, so children of all inner flowers, not in the new flower.
     children: List[Flower] = []
     for inner in innerFlowers:
@@ -225,8 +612,12 @@ class Instance:
     children = list(set(children))
 
     # Now we have the new flower so we can create it.
-    newFlower = Flower(W.parent, W.parentEdge, children, innerFlowers)
-    newFlower.textRepr = str(innerFlowers)
+    newFlower = Flower(W.parent, W.parentEdge, children, innerFlowers, innerEdges)
+    newFlower.tree = W.tree
+    newFlower.setChargeDirection(1, self.globalDelta)
+    newFlower.setTotalOuterFlower(newFlower)
+    if self.stats is not None:
+      self.stats.recordBlossom(newFlower)
 
     # Change the parent child to the new flower, and the children parents to the new flower.
     for child in children:
@@ -239,10 +630,11 @@ class Instance:
       W.parent.children.remove(W)
       W.parent.children.append(newFlower)
     else:
-      for tree in self.trees:
-        if tree.root == W:
-          tree.root = newFlower
-          break
+      assert W.tree is not None
+      W.tree.root = newFlower
+
+    # The inner flowers on odd levels are now on an even level, so their edges can get full.
+    oddInnerFlowers = [flower for flower in innerFlowers if flower.type == FlowerType.ODD]
 
     # Set outerFlower of all inner flowers and delete children
     for flower in innerFlowers:
@@ -250,9 +642,17 @@ class Instance:
       flower.outerFlower = newFlower
       flower.parent = None
       flower.parentEdge = None
+      flower.type = FlowerType.INNER
+      flower.tree = None
+      flower.setChargeDirection(0, self.globalDelta)
+      self.events.discard(flower)
+
+    for flower in oddInnerFlowers:
+      for vertex in flower.getAllLowestLevelFlowers():
+        for vertexEdge in vertex.edges:
+          scheduleEdge(vertexEdge, self.events, self.globalDelta)
 
   def P4(self, edge: Edge) -> None:
-    print(f"P4 on {edge}")
     """
     Naplnila sa hrana e spájajúca kvety K a H v 2 rôznych stromoch T1 a T2. Toto je vlastne jadro
     celého algoritmu, v ktorom zväčšíme párovanie M. Urobíme to tak, že nájdeme alternujúcu cestu, 
@@ -278,76 +678,68 @@ class Instance:
 
     # Special case - if both flowers are representing vertices and are not in trees, just add selected edge and add to dumbbells
     if edge.v1.outerFlower == None and edge.v2.outerFlower == None and edge.v1.parent is None and len(edge.v1.children) == 0 and edge.v2.parent is None and len(edge.v2.children) == 0:
-      self.otherEdges.remove(edge)
-      self.selectedEdges.append(edge)
-      edge.type = EdgeType.SELECTED
-      self.dumbbells.append(Dumbbell(edge.v1, edge.v2, edge))
-      toRemoveTrees: list[Tree] = []
-      for tree in self.trees:
-        if tree.root == edge.v1 or tree.root == edge.v2:
-          toRemoveTrees.append(tree)
+      self.setEdgeType(edge, EdgeType.SELECTED)
+      toRemoveTrees = [edge.v1.tree, edge.v2.tree]
+      self.addDumbbell(Dumbbell(edge.v1, edge.v2, edge))
       for tree in toRemoveTrees:
-        self.trees.remove(tree)
+        del self.trees[id(tree)]
+      self.scheduleFlowers([edge.v1, edge.v2])
       return
 
     # Make this edge blocked, it should be other before
-    edge.type = EdgeType.BLOCKED
-    self.otherEdges.remove(edge)
-    self.blockingEdges.append(edge)
-
-    # Find alternating path between the stem of T1 and T2 through the edge
-    stem1 = edge.v1.getTotalOuterFlower().getRoot().getStem()
-    stem2 = edge.v2.getTotalOuterFlower().getRoot().getStem()
-    alternatingPath, alternatingPathVertices = findAlternatingPath(end=stem2, pathSoFar=[], currentVertex=stem1, mustUseBlocked=True, visitedVertices=[stem1], roots=[edge.v1.getTotalOuterFlower().getRoot(), edge.v2.getTotalOuterFlower().getRoot()])
-    alternatingPathOuterVertices = getVerticesOnAlternatingPath(alternatingPathVertices)
-    # Find out what are the outer flowers of this path. Also save the edges connecting these flowers
-    alternatingOuterFlowers = findSubtrees(alternatingPathOuterVertices)
+    self.setEdgeType(edge, EdgeType.BLOCKED)
+
+    # Find alternating path between the stem of T1 and T2 through the edge, and the outer flowers on it
+    alternatingPath, alternatingOuterFlowers, stemChanges = findAlternatingPath(edge)
+    root1 = alternatingOuterFlowers[0]
+    root2 = alternatingOuterFlowers[-1]
+    toRemoveTrees = [root1.tree, root2.tree]
+    treeFlowers = root1.getAllSuccessors() + root2.getAllSuccessors()
+    # Find out the subtrees hanging from this path.
+    alternatingSubtrees = findSubtrees(alternatingOuterFlowers)
 
     # This path has first edge from L and last from L as well.
     # Exchange these edges between L and M.
     addToM = True
-    for edge in alternatingPath:
+    for pathEdge in alternatingPath:
       if addToM:
-        self.blockingEdges.remove(edge)
-        self.selectedEdges.append(edge)
-        edge.type = EdgeType.SELECTED
+        self.setEdgeType(pathEdge, EdgeType.SELECTED)
       else:
-        self.selectedEdges.remove(edge)
-        self.blockingEdges.append(edge)
-        edge.type = EdgeType.BLOCKED
+        self.setEdgeType(pathEdge, EdgeType.BLOCKED)
       addToM = not addToM
 
+    # Every flower the path goes through has its stem where the path enters it.
+    for flower, vertex in stemChanges:
+      flower.changeStemToVertex(vertex)
+
     # Destructurize the tree into dumbbells
     # First, make each pair from the path into dumbbells
-    assert len(alternatingPathOuterVertices) % 2 == 0
-    for i in range(0, len(alternatingPathOuterVertices), 2):
-      dumbbell = Dumbbell(alternatingPathOuterVertices[i], alternatingPathOuterVertices[i+1], findConnectingEdge(alternatingPathOuterVertices[i], alternatingPathOuterVertices[i+1], self.selectedEdges))
-      self.dumbbells.append(dumbbell)
-
-      # Remove parent and children
-      dumbbell.f1.parent = None
-      dumbbell.f2.parent = None
-      dumbbell.f1.children = []
-      dumbbell.f2.children = []
-    
+    assert len(alternatingOuterFlowers) % 2 == 0
+    # The pairs are connected by the edge to the parent of one of them, or by the filled edge.
+    for i in range(0, len(alternatingOuterFlowers), 2):
+      f1, f2 = alternatingOuterFlowers[i], alternatingOuterFlowers[i+1]
+      pairEdge = edge
+      if f2.parent == f1 and f2.parentEdge is not None:
+        pairEdge = f2.parentEdge
+      elif f1.parent == f2 and f1.parentEdge is not None:
+        pairEdge = f1.parentEdge
+      assert pairEdge.type == EdgeType.SELECTED
+      self.addDumbbell(Dumbbell(f1, f2, pairEdge))
+
     # Then, process the other part of the tree
-    # We need to find the subtrees, which are not a part of the alternating path
-    if len(alternatingOuterFlowers) > 0:
-      for subtree in alternatingOuterFlowers:
-        dumbbells = subtree.changeSubtreeIntoDumbbells()
-        for db in dumbbells:
-          db.f1.parent = None
-          db.f2.parent = None
-          db.f1.children = []
-          db.f2.children = []
-        self.dumbbells.extend(dumbbells)
+    for subtree in alternatingSubtrees:
+      for dumbbell in subtree.changeSubtreeIntoDumbbells():
+        self.addDumbbell(dumbbell)
+
+    # Edges from L between the flowers of the trees are now between dumbbells, so they are not full anymore.
+    for flower in treeFlowers:
+      if flower.parentEdge is not None and flower.parentEdge.type == EdgeType.BLOCKED:
+        self.makeEdgeOther(flower.parentEdge)
+      flower.parent = None
+      flower.parentEdge = None
+      flower.children = []
 
     # Finally delete the trees so only dumbbells will be left.
-    toRemoveTrees = []
-    stemOuter1 = stem1.getTotalOuterFlower()
-    stemOuter2 = stem2.getTotalOuterFlower()
-    for tree in self.trees:
-      if tree.root == stemOuter1 or tree.root == stemOuter2:
-        toRemoveTrees.append(tree)
     for tree in toRemoveTrees:
-        self.trees.remove(tree)
+      del self.trees[id(tree)]
+    self.scheduleFlowers(treeFlowers)
@@ -0,0 +1,46 @@
+from typing import Optional
+
+
+class Options:
+  """
+  Settings of how the matching is found, shared by the command line, the batch mode and the worker processes.
+  """
+  useCache: bool # Store the parsed input in a binary file next to it
+  warmStart: bool # Start from a greedy matching and charges
+  integer: bool # Doubled integer capacities and exact integer charges
+  neighbours: Optional[int] # If set, the input contains points and the solver starts with this many nearest neighbours
+  components: bool # Solve the connected components separately
+  kernel: bool # Reduce the graph before solving
+  jobs: int # Number of processes
+  checkpoint: Optional[str] # File to save the state of the solver to during the run
+  checkpointEvery: Optional[int] # Save the state every this many actions
+  checkpointSeconds: Optional[float] # Save the state every this many seconds
+  resume: Optional[str] # File with a saved state to continue from
+  maxActions: Optional[int] # Stop with a partial matching after this many actions
+  maxSeconds: Optional[float] # Stop with a partial matching after this many seconds
+  exportDuals: Optional[str] # File to save the final charges to, for the verifier
+  dense: Optional[bool] # Solve with the weight matrix, None to decide by the density of the graph
+  maxWeight: bool # The capacities are weights, find the matching of the maximum weight, not necessarily perfect
+
+  def __init__(self, useCache: bool = False, warmStart: bool = False, integer: bool = False, neighbours: Optional[int] = None,
+               components: bool = False, kernel: bool = False, jobs: int = 1, checkpoint: Optional[str] = None,
+               checkpointEvery: Optional[int] = None, checkpointSeconds: Optional[float] = None, resume: Optional[str] = None,
+               maxActions: Optional[int] = None, maxSeconds: Optional[float] = None,
+               exportDuals: Optional[str] = None, dense: Optional[bool] = None,
+               maxWeight: bool = False) -> None:
+    self.useCache = useCache
+    self.warmStart = warmStart
+    self.integer = integer
+    self.neighbours = neighbours
+    self.components = components
+    self.kernel = kernel
+    self.jobs = jobs
+    self.checkpoint = checkpoint
+    self.checkpointEvery = checkpointEvery
+    self.checkpointSeconds = checkpointSeconds
+    self.resume = resume
+    self.maxActions = maxActions
+    self.maxSeconds = maxSeconds
+    self.exportDuals = exportDuals
+    self.dense = dense
+    self.maxWeight = maxWeight
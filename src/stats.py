@@ -0,0 +1,74 @@
+from __future__ import annotations
+import math
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from src.dataStructures import Flower
+
+if TYPE_CHECKING:
+  from src.instance import Instance
+
+
+PRIMITIVES = ["dual step", "P1", "P2", "P3", "P4"]
+
+
+class Stats:
+  """
+  Counters and timers collected while the instance runs. It is only filled when set as instance.stats, otherwise
+  the instance does not measure anything.
+
+  The epsilon histogram counts the dual steps by the power of two of their epsilon, so the key k means
+  an epsilon in [2^k, 2^(k+1)). Every sampleEvery actions the number of trees and dumbbells is stored in samples
+  together with the number of actions and the global delta.
+  """
+  counts: Dict[str, int]
+  times: Dict[str, float] # Cumulative time in seconds
+  epsilonHistogram: Dict[int, int]
+  maxNesting: int # Number of levels of the deepest blossom created
+  nesting: Dict[Flower, int]
+  samples: List[Tuple[int, float, int, int]]
+  sampleEvery: int
+  actions: int
+  callback: Optional[Callable[[str, Instance], None]] # Called with the name of the primitive after every action
+
+  def __init__(self, sampleEvery: int = 100, callback: Optional[Callable[[str, Instance], None]] = None) -> None:
+    self.counts = {primitive: 0 for primitive in PRIMITIVES}
+    self.times = {primitive: 0.0 for primitive in PRIMITIVES}
+    self.epsilonHistogram = {}
+    self.maxNesting = 0
+    self.nesting = {}
+    self.samples = []
+    self.sampleEvery = sampleEvery
+    self.actions = 0
+    self.callback = callback
+
+  def recordAction(self, primitive: str, time: float, instance: Instance) -> None:
+    self.counts[primitive] += 1
+    self.times[primitive] += time
+    if self.actions % self.sampleEvery == 0:
+      self.samples.append((self.actions, instance.globalDelta / instance.scale, len(instance.trees), len(instance.dumbbells)))
+    self.actions += 1
+    if self.callback is not None:
+      self.callback(primitive, instance)
+
+  def recordEpsilon(self, epsilon: float) -> None:
+    bucket = math.floor(math.log2(epsilon))
+    self.epsilonHistogram[bucket] = self.epsilonHistogram.get(bucket, 0) + 1
+
+  def recordBlossom(self, flower: Flower) -> None:
+    # The inner flowers of a new blossom do not change until it is expanded, so their nesting is known.
+    nesting = 1 + max(self.nesting.get(inner, 0) for inner in flower.innerFlowers)
+    self.nesting[flower] = nesting
+    self.maxNesting = max(self.maxNesting, nesting)
+
+  def report(self) -> str:
+    lines = [f"{'primitive':<10} {'count':>8} {'time [s]':>10}"]
+    for primitive in PRIMITIVES:
+      lines.append(f"{primitive:<10} {self.counts[primitive]:>8} {self.times[primitive]:>10.4f}")
+    lines.append(f"Max blossom nesting {self.maxNesting}")
+    lines.append("Epsilon histogram")
+    for bucket in sorted(self.epsilonHistogram):
+      lines.append(f"  [{2.0 ** bucket:g}, {2.0 ** (bucket + 1):g}) {self.epsilonHistogram[bucket]}")
+    lines.append("Actions, global delta, trees, dumbbells")
+    for actions, globalDelta, trees, dumbbells in self.samples:
+      lines.append(f"  {actions} {globalDelta:g} {trees} {dumbbells}")
+    return "\n".join(lines)
@@ -1,62 +1,129 @@
+from typing import List, Tuple, Union
 from src.dataStructures import Edge, Flower
-from src.enums.edge import EdgeType
+from src.utils.edge import findConnectingEdge
 
 
-def findAlternatingPath(end: Flower, pathSoFar: list[Edge], visitedVertices: list[Flower], currentVertex: Flower, mustUseBlocked: bool, roots: list[Flower]) -> tuple[list[Edge], list[Flower]]:
+def getInnerFlowerIndex(flower: Flower, vertex: Flower) -> int:
+  for i in range(len(flower.innerFlowers)):
+    if flower.innerFlowers[i].containsVertex(vertex):
+      return i
+
+  raise ValueError("The vertex is not in the flower")
+
+def getEndInFlower(edge: Edge, flower: Flower) -> Flower:
+  if flower.containsVertex(edge.v1):
+    return edge.v1
+  return edge.v2
+
+# Either an edge of the path, or a part of the path inside a flower: (towards stem, vertex, flower) means the path
+# from the vertex to the stem of the flower if towards stem is true, or from the stem to the vertex otherwise.
+PathPart = Union[Edge, Tuple[bool, Flower, Flower]]
+
+def reversePathPart(part: PathPart) -> PathPart:
+  if isinstance(part, Edge):
+    return part
+  return (not part[0], part[1], part[2])
+
+def getPartsInFlower(vertex: Flower, flower: Flower) -> List[PathPart]:
+  """
+  Splits the path from the vertex to the stem of the flower, which is the path from Lemma 3.13 walked backwards,
+  into the parts in the inner flowers and the edges between them. If it is not empty, the path starts with an
+  edge from M and ends with an edge from L.
   """
-  Finds alternating path (between L and M edges) from given vertex. If it needs to choose a elected edge, it has
-  only one possibility, but for blocking it has multiple. Thus it tries both.
-  If no path is found, Error is raised.
+  index = getInnerFlowerIndex(flower, vertex)
+  parts: List[PathPart] = [(True, vertex, flower.innerFlowers[index])]
+
+  # Edges between inner flowers K{i+1} and K{i+2} are from L for even i, and from M for odd i.
+  # Go around in the direction, where the first edge is from M, then the path ends in K1 with an edge from L.
+  step = 1 if index % 2 == 1 else -1
+  count = len(flower.innerFlowers)
+  current = index
+  while current != 0:
+    following = (current + step) % count
+    afterFollowing = (following + step) % count
+    inner = flower.innerFlowers[following]
+    nextInner = flower.innerFlowers[afterFollowing]
+    edgeL = findConnectingEdge(flower, following, afterFollowing)
+
+    # The edge from M enters the stem of the following flower, go through it to the edge from L.
+    parts.append(findConnectingEdge(flower, current, following))
+    parts.append((False, getEndInFlower(edgeL, inner), inner))
+    parts.append(edgeL)
+    parts.append((True, getEndInFlower(edgeL, nextInner), nextInner))
+    current = afterFollowing
+
+  return parts
+
+def getPartsToRoot(vertex: Flower) -> Tuple[List[PathPart], List[Flower]]:
+  """
+  Splits the alternating path from a vertex in a flower on an even level to the stem of the root of its tree into
+  the parts in the outer flowers and the edges of the tree. Returns them and the outer flowers on the path,
+  starting with the one containing the vertex.
   """
-  if currentVertex == end:
-    return (pathSoFar, visitedVertices)
-  
-  if mustUseBlocked:
-    for edge in currentVertex.edges:
-      if edge.type == EdgeType.BLOCKED:
-        nextVertex = edge.v1
-        if nextVertex == currentVertex:
-          nextVertex = edge.v2
-        if nextVertex in visitedVertices or nextVertex.getTotalOuterFlower().getRoot() not in roots:
-          continue
-        try:
-          return findAlternatingPath(end, pathSoFar + [edge], visitedVertices + [nextVertex], nextVertex, not mustUseBlocked, roots)
-        except:
-          pass
-  else:
-    usedEdge = None
-    for edge in currentVertex.edges:
-      if edge.type == EdgeType.SELECTED:
-        usedEdge = edge
-        break
-    if usedEdge is None:
-      raise ValueError("There is no edge to be chosen")
-    
-    nextVertex = usedEdge.v1
-    if nextVertex == currentVertex:
-      nextVertex = usedEdge.v2
-    
-    if nextVertex in visitedVertices:
-      raise ValueError("There is no edge to be chosen")
-    
-    return findAlternatingPath(end, pathSoFar + [usedEdge], visitedVertices + [nextVertex], nextVertex, not mustUseBlocked, roots)
-
-  raise ValueError("Invalid Path")
+  flower = vertex.getTotalOuterFlower()
+  parts: List[PathPart] = [(True, vertex, flower)]
+  flowers = [flower]
+  while flower.parent is not None:
+    # The flower is on an even level, so the edge to its parent is from M and it goes to the stem of the parent.
+    oddFlower = flower.parent
+    edgeL = oddFlower.parentEdge
+    assert flower.parentEdge is not None
+    assert edgeL is not None
+    assert oddFlower.parent is not None
+    parts.append(flower.parentEdge)
+    parts.append((False, getEndInFlower(edgeL, oddFlower), oddFlower))
+    parts.append(edgeL)
+
+    flower = oddFlower.parent
+    parts.append((True, getEndInFlower(edgeL, flower), flower))
+    flowers.extend([oddFlower, flower])
+
+  return parts, flowers
+
+def findAlternatingPath(edge: Edge) -> Tuple[List[Edge], List[Flower], List[Tuple[Flower, Flower]]]:
+  """
+  Finds the alternating path (between L and M edges) from the stem of the root of one tree to the stem of the root of
+  the other tree, which goes through the given edge. It follows the edges of the trees and inside the flowers
+  it uses the path from Lemma 3.13. The first and the last edge are from L.
+  Returns the path, the outer flowers on it in order, and the new stems of the flowers the path goes through:
+  after the edges get exchanged, the stem of every flower is the vertex where the path enters it.
+
+  The parts of the path are expanded with a stack, without recursion, so it takes time linear in the length of the
+  path and the sizes of the cycles it goes around.
+  """
+  parts1, flowers1 = getPartsToRoot(edge.v1)
+  parts2, flowers2 = getPartsToRoot(edge.v2)
+  flowers1.reverse()
+
+  # The stack has the part which comes first on its top. The path starts with the parts to the first root reversed.
+  stack: List[PathPart] = parts2[::-1]
+  stack.append(edge)
+  stack.extend(map(reversePathPart, parts1))
+  path: List[Edge] = []
+  stemChanges: List[Tuple[Flower, Flower]] = []
+  while len(stack) > 0:
+    part = stack.pop()
+    if isinstance(part, Edge):
+      path.append(part)
+      continue
+
+    towardsStem, vertex, flower = part
+    if flower.isOnlyVertex():
+      continue
+    stemChanges.append((flower, vertex))
+    innerParts = getPartsInFlower(vertex, flower)
+    if towardsStem:
+      stack.extend(reversed(innerParts))
+    else:
+      stack.extend(map(reversePathPart, innerParts))
+
+  return path, flowers1 + flowers2, stemChanges
 
 def hasIntersection(l1: list, l2: list) -> bool:
   set1 = set(l1)
   set2 = set(l2)
   return len(set1.intersection(set2)) > 0
 
-def getVerticesOnAlternatingPath(alternatingPathOuterVertices: list[Flower]) -> list[Flower]:
-  result = []
-  for fl in alternatingPathOuterVertices:
-    outer = fl.getTotalOuterFlower()
-    if outer not in result:
-      result.append(outer)
-
-  return result
-
 def findSubtrees(alternatingPathOuterVertices: list[Flower]) -> list[Flower]:
   # Go through the alternating path, find the outerFlower and add the children, which are not in alternatingPath
   subtrees: list[Flower] = []
@@ -0,0 +1,137 @@
+import concurrent.futures
+from typing import List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.budget import Budget
+from src.checkpoint import Checkpoint, loadState
+from src.graph import Graph
+from src.instance import Instance
+from src.options import Options
+from src.stats import Stats
+from src.utils.dense import isDense, solveDense
+from src.utils.kernel import solveWithKernel
+from src.utils.verify import saveDuals
+
+
+def findComponents(graph: Graph) -> npt.NDArray[np.int64]:
+  """
+  Label of every vertex is the smallest vertex of its component. Every vertex points to the root of its part and
+  the edges are kept between the roots only. In every round each root gets heads or tails at random, and the roots
+  with tails are hooked onto a neighbouring root with heads. A root with an edge is hooked with a probability of at
+  least 1/4, so the expected number of rounds is O(log n), however long the paths in the graph are.
+  """
+  rng = np.random.default_rng(0)
+  parents = np.arange(graph.vertexCount, dtype=np.int64)
+  us = graph.endpoints[:, 0].astype(np.int64)
+  vs = graph.endpoints[:, 1].astype(np.int64)
+  while True:
+    us = parents[us]
+    vs = parents[vs]
+    between = us != vs
+    us = us[between]
+    vs = vs[between]
+    if len(us) == 0:
+      break
+    heads = rng.random(graph.vertexCount) < 0.5
+    hook = ~heads[us] & heads[vs]
+    parents[us[hook]] = vs[hook]
+    hook = heads[us] & ~heads[vs]
+    parents[vs[hook]] = us[hook]
+    # The roots with heads were not hooked, so one jump makes every vertex point to a root again.
+    parents = parents[parents]
+
+  smallest = np.full(graph.vertexCount, graph.vertexCount, dtype=np.int64)
+  np.minimum.at(smallest, parents, np.arange(graph.vertexCount, dtype=np.int64))
+  return smallest[parents]
+
+def splitIntoComponents(graph: Graph) -> List[Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], Graph]]:
+  """
+  Splits the graph into its connected components. For every component returns the ids of its vertices and edges
+  in the whole graph, and the component as a graph of its own. A component with an odd number of vertices has no
+  perfect matching, so it is rejected before solving anything.
+  """
+  labels = findComponents(graph)
+  roots, vertexComponents, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+  odd = np.flatnonzero(sizes % 2 != 0)
+  if len(odd) > 0:
+    raise ValueError(f"The component of the vertex {roots[odd[0]] + 1} has an odd number of vertices, so there is no perfect matching")
+
+  # Index of every vertex inside of its component, vertices are ordered by the component and then by id.
+  vertexOrder = np.argsort(vertexComponents, kind='stable')
+  vertexStarts = np.concatenate([[0], np.cumsum(sizes)])
+  localIds = np.empty(graph.vertexCount, dtype=np.int64)
+  localIds[vertexOrder] = np.arange(graph.vertexCount) - np.repeat(vertexStarts[:-1], sizes)
+
+  edgeComponents = vertexComponents[graph.endpoints[:, 0]]
+  edgeOrder = np.argsort(edgeComponents, kind='stable')
+  edgeStarts = np.concatenate([[0], np.cumsum(np.bincount(edgeComponents, minlength=len(roots)))])
+
+  result: List[Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], Graph]] = []
+  for component in range(len(roots)):
+    vertices = vertexOrder[vertexStarts[component]:vertexStarts[component + 1]]
+    edges = edgeOrder[edgeStarts[component]:edgeStarts[component + 1]]
+    result.append((vertices, edges, Graph(len(vertices), localIds[graph.endpoints[edges]], graph.capacities[edges])))
+  return result
+
+def solveGraph(graph: Graph, options: Options, stats: Optional[Stats] = None, budget: Optional[Budget] = None) -> List[int]:
+  # Returns the ids of the edges in the matching, which is only partial if the budget runs out.
+  # The dense mode has no instance, so it is not used with the features which need one, the stats included.
+  needsInstance = options.resume is not None or options.checkpoint is not None or options.exportDuals is not None or \
+                  budget is not None or stats is not None
+  if not needsInstance and (options.dense or (options.dense is None and isDense(graph))):
+    return solveDense(graph, not options.maxWeight)
+
+  # The maximum weight matching is the matching of the minimum cost of any size, with the costs being negated weights.
+  costs = Graph(graph.vertexCount, graph.endpoints, -graph.capacities) if options.maxWeight else graph
+  if options.resume is not None:
+    instance = loadState(options.resume)
+    if len(instance.vertices) != graph.vertexCount or len(instance.edges) != graph.edgeCount or instance.perfect == options.maxWeight:
+      raise ValueError(f"The saved state in {options.resume} does not belong to this graph")
+  else:
+    instance = Instance.fromGraph(costs, options.integer, not options.maxWeight)
+  instance.stats = stats
+  checkpoint = None
+  if options.checkpoint is not None:
+    checkpoint = Checkpoint(options.checkpoint, options.checkpointEvery, options.checkpointSeconds)
+  instance.run(options.warmStart and options.resume is None, checkpoint, budget)
+  if options.exportDuals is not None:
+    saveDuals(instance.exportDuals(), options.exportDuals)
+  return sorted(instance.selectedEdges)
+
+def solveByComponents(graph: Graph, options: Options, stats: Optional[Stats] = None) -> List[int]:
+  """
+  Solves every connected component of the graph separately, in parallel processes if there are more jobs,
+  and returns the ids of the edges in the matching of the whole graph. With stats, the components are solved
+  in this process, so that the stats are collected over all of them.
+  """
+  components = splitIntoComponents(graph)
+  # Components of two vertices are a single edge, or the cheapest of parallel edges.
+  selected: List[int] = []
+  rest: List[Tuple[npt.NDArray[np.int64], Graph]] = []
+  for vertices, edges, component in components:
+    if len(vertices) == 2:
+      selected.append(int(edges[np.argmin(component.capacities)]))
+    else:
+      rest.append((edges, component))
+
+  if options.jobs > 1 and len(rest) > 1 and stats is None:
+    with concurrent.futures.ProcessPoolExecutor(max_workers=options.jobs) as executor:
+      results = list(executor.map(solveGraph, [component for _, component in rest], [options] * len(rest)))
+  else:
+    results = [solveGraph(component, options, stats) for _, component in rest]
+
+  for (edges, _), localSelected in zip(rest, results):
+    selected.extend(edges[localSelected].tolist())
+  selected.sort()
+  return selected
+
+def solveWithOptions(graph: Graph, options: Options, stats: Optional[Stats] = None, budget: Optional[Budget] = None) -> List[int]:
+  # The whole way from a graph to the ids of the edges in its matching, through the kernel and the components if set.
+  def solve(graph: Graph) -> List[int]:
+    if options.components:
+      return solveByComponents(graph, options, stats)
+    return solveGraph(graph, options, stats, budget)
+
+  return solveWithKernel(graph, solve) if options.kernel else solve(graph)
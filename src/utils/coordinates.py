@@ -0,0 +1,109 @@
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.graph import Graph
+from src.instance import Instance
+from src.options import Options
+from src.stats import Stats
+
+
+# Number of distances computed at once when going through all the pairs of points.
+CHUNK_SIZE = 1 << 22
+
+def parseCoordinateFile(fileName: str) -> npt.NDArray[np.float64]:
+  """
+  Reads the points of a complete graph, either from a TSPLIB file with a NODE_COORD_SECTION, or from a file
+  with the number of points on the first line followed by lines x y. The weight of an edge is the distance
+  of its ends rounded to an integer, as EUC_2D in TSPLIB.
+  """
+  with open(fileName, 'r') as file:
+    lines = file.read().splitlines()
+
+  for i, line in enumerate(lines):
+    if line.strip().startswith('NODE_COORD_SECTION'):
+      rows = []
+      for coordinateLine in lines[i + 1:]:
+        values = coordinateLine.split()
+        if len(values) < 3:
+          break
+        rows.append((float(values[1]), float(values[2])))
+      return np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+  numbers = np.array(" ".join(lines).split(), dtype=np.float64)
+  if len(numbers) == 0 or len(numbers) != 1 + 2 * int(numbers[0]):
+    raise ValueError(f"Malformed coordinate file {fileName}")
+  return numbers[1:].reshape(-1, 2)
+
+def getDistances(points: npt.NDArray[np.float64], us: npt.ArrayLike, vs: npt.ArrayLike) -> npt.NDArray[np.float64]:
+  differences = points[np.asarray(us, dtype=np.intp)] - points[np.asarray(vs, dtype=np.intp)]
+  return np.rint(np.sqrt((differences ** 2).sum(axis=-1)))
+
+def findCandidateEdges(points: npt.NDArray[np.float64], neighbours: int) -> npt.NDArray[np.int64]:
+  # Edges to the nearest neighbours of every point, together with the pairs of consecutive points sorted
+  # by coordinates, so the candidate graph always has a perfect matching.
+  count = len(points)
+  if count % 2 != 0:
+    raise ValueError("A perfect matching needs an even number of vertices")
+
+  pairs: List[npt.NDArray[np.int64]] = [np.lexsort((points[:, 1], points[:, 0])).reshape(-1, 2)]
+  neighbours = min(neighbours, count - 1)
+  chunk = max(1, CHUNK_SIZE // max(1, count))
+  for start in range(0, count, chunk):
+    rows = np.arange(start, min(count, start + chunk))
+    distances = ((points[rows, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+    distances[np.arange(len(rows)), rows] = np.inf
+    nearest = np.argpartition(distances, neighbours - 1, axis=1)[:, :neighbours] if neighbours > 0 else np.zeros((len(rows), 0), dtype=np.int64)
+    pairs.append(np.stack([np.repeat(rows, nearest.shape[1]), nearest.reshape(-1)], axis=1))
+
+  endpoints = np.sort(np.concatenate(pairs), axis=1)
+  return np.unique(endpoints, axis=0)
+
+def findViolatedEdges(instance: Instance, points: npt.NDArray[np.float64], present: Set[Tuple[int, int]]) -> List[Tuple[int, int, float]]:
+  """
+  Goes through all the pairs of points and returns those which are not edges of the instance yet and whose
+  distance is smaller than the charges of their ends. The total charges of the vertices are only a bound
+  for the pairs in a common blossom, so these pairs are checked exactly afterwards.
+  """
+  count = len(points)
+  charges = instance.getVertexCharges()
+  result: List[Tuple[int, int, float]] = []
+  chunk = max(1, CHUNK_SIZE // max(1, count))
+  for start in range(0, count, chunk):
+    rows = np.arange(start, min(count, start + chunk))
+    distances = np.rint(np.sqrt(((points[rows, None, :] - points[None, :, :]) ** 2).sum(axis=2)))
+    slacks = distances - charges[rows, None] - charges[None, :]
+    us, vs = np.nonzero((slacks < 0) & (np.arange(count)[None, :] > rows[:, None]))
+    for u, v in zip((rows[us]).tolist(), vs.tolist()):
+      if (u, v) in present:
+        continue
+      vertex1 = instance.vertices[u]
+      vertex2 = instance.vertices[v]
+      distance = float(distances[u - start, v])
+      if distance * instance.scale < vertex1.getTotalCharge(vertex2, instance.globalDelta) + vertex2.getTotalCharge(vertex1, instance.globalDelta):
+        result.append((u, v, distance))
+
+  return result
+
+def solveCoordinates(points: npt.NDArray[np.float64], neighbours: int = 10, options: Optional[Options] = None, stats: Optional[Stats] = None) -> Instance:
+  """
+  Solves the complete graph on the points without creating all of its edges. The instance starts with the edges
+  to the nearest neighbours, then the edges which violate the final charges are added and the instance is solved
+  again from its previous state, until no edge is violated. Then the matching is optimal for the complete graph.
+  """
+  options = options if options is not None else Options()
+  endpoints = findCandidateEdges(points, neighbours)
+  instance = Instance.fromGraph(Graph(len(points), endpoints, getDistances(points, endpoints[:, 0], endpoints[:, 1])), options.integer)
+  instance.stats = stats
+  present = {(u, v) for u, v in endpoints.tolist()}
+  instance.run(options.warmStart)
+
+  while True:
+    violated = findViolatedEdges(instance, points, present)
+    if len(violated) == 0:
+      return instance
+    for u, v, distance in violated:
+      instance.insertEdge(u, v, distance)
+      present.add((u, v))
+    instance.run()
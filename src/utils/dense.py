@@ -0,0 +1,341 @@
+from collections import deque
+from typing import Deque, List, Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from src.graph import Graph
+
+
+# Graphs with at least this many edges per pair of vertices are solved by the dense mode automatically.
+DENSE_THRESHOLD = 0.15
+
+def isDense(graph: Graph) -> bool:
+  return graph.vertexCount > 0 and graph.edgeCount >= DENSE_THRESHOLD * graph.vertexCount ** 2 and \
+    bool(np.all(graph.capacities == np.rint(graph.capacities)))
+
+class DenseMatching:
+  """
+  The classical O(n^3) weighted blossom algorithm on a weight matrix, which finds a maximum weight matching.
+  The minimum cost perfect matching is the maximum weight matching with the weights offset - capacity, where the
+  offset is so big that any perfect matching weighs more than a matching with fewer edges.
+
+  Vertices are 1..n, blossoms n+1..2n and 0 means none. The row and column of a blossom in the matrices hold the
+  best edge between it and every other vertex or blossom, so each of them is scanned as one NumPy operation.
+  Weights and duals are integers, the duals of the vertices are doubled, so every step is exact. Needs O(n^2) memory.
+  """
+  n: int
+  perfect: bool # If not set, the maximum weight matching is found instead, of the capacities as weights
+  outerCount: int # The highest index of a vertex or blossom in use
+  weights: npt.NDArray[np.int64] # weights[x, y] is the weight of the best edge between x and y, 0 if there is none
+  ends1: npt.NDArray[np.int32] # The vertex of the edge weights[x, y] in x
+  ends2: npt.NDArray[np.int32] # The vertex of the edge weights[x, y] in y
+  edgeIds: npt.NDArray[np.int64] # The id in the graph of the edge between two vertices
+  duals: npt.NDArray[np.int64]
+  match: npt.NDArray[np.int64] # The vertex the vertex or blossom is matched to
+  outer: npt.NDArray[np.int64] # The outermost blossom containing the vertex or blossom, 0 for unused blossoms
+  labels: npt.NDArray[np.int64] # 0 for even, 1 for odd and -1 for flowers not in a tree
+  parents: npt.NDArray[np.int64] # The vertex the odd flower is reached from
+  bestFrom: npt.NDArray[np.int64] # The vertex in an even flower with the tightest edge to the flower, or 0
+  innerFrom: npt.NDArray[np.int64] # innerFrom[b, v] is the inner flower of the blossom b containing the vertex v
+  inner: List[List[int]] # The inner flowers of every blossom, a cycle starting with the one containing its base
+  visited: npt.NDArray[np.int64]
+  visitStamp: int
+  queue: Deque[int]
+
+  def __init__(self, graph: Graph, perfect: bool = True) -> None:
+    n = graph.vertexCount
+    size = 2 * n + 1
+    capacities = graph.capacities
+    if not np.all(capacities == np.rint(capacities)):
+      raise ValueError("The dense mode needs integer weights")
+
+    self.n = n
+    self.perfect = perfect
+    self.outerCount = n
+    self.weights = np.zeros((size, size), dtype=np.int64)
+    self.edgeIds = np.full((n + 1, n + 1), -1, dtype=np.int64)
+    if graph.edgeCount > 0:
+      # Without a perfect matching the capacities are the weights themselves, edges of no weight are never used.
+      values = capacities.astype(np.int64)
+      if perfect:
+        low = int(values.min())
+        high = int(values.max())
+        values = (n // 2 + 1) * (high - low + 1) + high - values
+      # Of parallel edges only the heaviest one is kept.
+      ends = np.sort(graph.endpoints, axis=1).astype(np.int64) + 1
+      order = np.lexsort((-values, ends[:, 1], ends[:, 0]))
+      order = order[values[order] > 0]
+      _, first = np.unique(ends[order, 0] * size + ends[order, 1], return_index=True)
+      kept = order[first]
+      us = ends[kept, 0]
+      vs = ends[kept, 1]
+      self.weights[us, vs] = self.weights[vs, us] = values[kept]
+      self.edgeIds[us, vs] = self.edgeIds[vs, us] = kept
+
+    indices = np.arange(size, dtype=np.int32)
+    self.ends1 = np.repeat(indices[:, None], size, axis=1)
+    self.ends2 = np.repeat(indices[None, :], size, axis=0)
+    self.duals = np.zeros(size, dtype=np.int64)
+    self.duals[1:n + 1] = self.weights.max(initial=0)
+    self.match = np.zeros(size, dtype=np.int64)
+    self.outer = np.arange(size, dtype=np.int64)
+    self.outer[n + 1:] = 0
+    self.labels = np.full(size, -1, dtype=np.int64)
+    self.parents = np.zeros(size, dtype=np.int64)
+    self.bestFrom = np.zeros(size, dtype=np.int64)
+    self.innerFrom = np.zeros((size, n + 1), dtype=np.int64)
+    self.innerFrom[np.arange(n + 1), np.arange(n + 1)] = np.arange(n + 1)
+    self.inner = [[] for _ in range(size)]
+    self.visited = np.zeros(size, dtype=np.int64)
+    self.visitStamp = 0
+    self.queue = deque()
+
+  def getSlack(self, x: int, y: int) -> int:
+    return int(self.duals[self.ends1[x, y]] + self.duals[self.ends2[x, y]] - 2 * self.weights[x, y])
+
+  def getSlacks(self, xs: Union[int, npt.NDArray[np.int64]], ys: Union[int, npt.NDArray[np.int64]]) -> npt.NDArray[np.int64]:
+    return self.duals[self.ends1[xs, ys]] + self.duals[self.ends2[xs, ys]] - 2 * self.weights[xs, ys]
+
+  def getRowSlacks(self, x: int, ys: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    # The same for one row, taken as a view first, which is much faster than indexing both dimensions.
+    return self.duals[self.ends1[x][ys]] + self.duals[self.ends2[x][ys]] - 2 * self.weights[x][ys]
+
+  def updateBestFrom(self, u: int, xs: npt.NDArray[np.int64], slacks: npt.NDArray[np.int64]) -> None:
+    # The even vertex u is the new best end of the edges to the flowers xs whose edges from it are tighter.
+    outer = self.outer[xs] == xs
+    xs = xs[outer]
+    slacks = slacks[outer]
+    current = self.bestFrom[xs]
+    better = current == 0
+    known = ~better
+    better[known] = slacks[known] < self.getSlacks(current[known], xs[known])
+    self.bestFrom[xs[better]] = u
+
+  def setBestFrom(self, x: int) -> None:
+    vertices = np.arange(1, self.n + 1)
+    outer = self.outer[vertices]
+    candidates = vertices[(self.weights[vertices, x] > 0) & (outer != x) & (self.labels[outer] == 0)]
+    self.bestFrom[x] = 0 if len(candidates) == 0 else candidates[np.argmin(self.getSlacks(candidates, x))]
+
+  def push(self, x: int) -> None:
+    # Queues all the vertices in the flower.
+    stack = [x]
+    while len(stack) > 0:
+      flower = stack.pop()
+      if flower <= self.n:
+        self.queue.append(flower)
+      else:
+        stack.extend(self.inner[flower])
+
+  def setOuter(self, x: int, blossom: int) -> None:
+    stack = [x]
+    while len(stack) > 0:
+      flower = stack.pop()
+      self.outer[flower] = blossom
+      if flower > self.n:
+        stack.extend(self.inner[flower])
+
+  def getPosition(self, blossom: int, flower: int) -> int:
+    # Position of the inner flower, the cycle is reversed if needed, so the path to it from the base is even.
+    inner = self.inner[blossom]
+    position = inner.index(flower)
+    if position % 2 == 1:
+      inner[1:] = inner[:0:-1]
+      return len(inner) - position
+    return position
+
+  def setMatch(self, u: int, v: int) -> None:
+    # Matches the flower u along its best edge to v, and rematches the inside of the blossoms on the way.
+    stack = [(u, v)]
+    while len(stack) > 0:
+      u, v = stack.pop()
+      self.match[u] = self.ends2[u, v]
+      if u > self.n:
+        base = int(self.innerFrom[u, self.ends1[u, v]])
+        position = self.getPosition(u, base)
+        inner = self.inner[u]
+        stack.extend((inner[i], inner[i ^ 1]) for i in range(position))
+        stack.append((base, v))
+        self.inner[u] = inner[position:] + inner[:position]
+
+  def augment(self, u: int, v: int) -> None:
+    while True:
+      next = int(self.outer[self.match[u]])
+      self.setMatch(u, v)
+      if next == 0:
+        return
+      self.setMatch(next, int(self.outer[self.parents[next]]))
+      u = int(self.outer[self.parents[next]])
+      v = next
+
+  def findLCA(self, u: int, v: int) -> int:
+    self.visitStamp += 1
+    while u != 0 or v != 0:
+      if u != 0:
+        if self.visited[u] == self.visitStamp:
+          return u
+        self.visited[u] = self.visitStamp
+        u = int(self.outer[self.match[u]])
+        if u != 0:
+          u = int(self.outer[self.parents[u]])
+      u, v = v, u
+    return 0
+
+  def getPathToBase(self, x: int, lca: int) -> List[int]:
+    # The even and odd flowers on the path up the tree, the odd ones are queued as they become even in the blossom.
+    path: List[int] = []
+    while x != lca:
+      y = int(self.outer[self.match[x]])
+      path.extend([x, y])
+      self.push(y)
+      x = int(self.outer[self.parents[y]])
+    return path
+
+  def addBlossom(self, u: int, lca: int, v: int) -> None:
+    blossom = self.n + 1
+    while blossom <= self.outerCount and self.outer[blossom] != 0:
+      blossom += 1
+    if blossom > self.outerCount:
+      self.outerCount += 1
+    self.duals[blossom] = 0
+    self.labels[blossom] = 0
+    self.match[blossom] = self.match[lca]
+
+    # The path from u to the base is reversed, so the cycle goes from the base to u and then back from v.
+    inner = [lca] + self.getPathToBase(u, lca)
+    inner[1:] = inner[:0:-1]
+    inner.extend(self.getPathToBase(v, lca))
+    self.inner[blossom] = inner
+    self.setOuter(blossom, blossom)
+
+    # The best edges of the blossom are the best edges of its inner flowers.
+    columns = np.arange(1, self.outerCount + 1)
+    self.weights[blossom, columns] = self.weights[columns, blossom] = 0
+    self.innerFrom[blossom] = 0
+    for flower in inner:
+      better = columns[(self.weights[blossom, columns] == 0) | (self.getSlacks(flower, columns) < self.getSlacks(blossom, columns))]
+      for matrix in (self.weights, self.ends1, self.ends2):
+        matrix[blossom, better] = matrix[flower, better]
+        matrix[better, blossom] = matrix[better, flower]
+      self.innerFrom[blossom, self.innerFrom[flower] != 0] = flower
+    self.setBestFrom(blossom)
+
+  def expandBlossom(self, blossom: int) -> None:
+    # Expands an odd blossom with zero dual, its inner flowers on the even path from the base stay in the tree.
+    for flower in self.inner[blossom]:
+      self.setOuter(flower, flower)
+    base = int(self.innerFrom[blossom, self.ends1[blossom, self.parents[blossom]]])
+    position = self.getPosition(blossom, base)
+    inner = self.inner[blossom]
+    for i in range(0, position, 2):
+      odd = inner[i]
+      even = inner[i + 1]
+      self.parents[odd] = self.ends1[even, odd]
+      self.labels[odd] = 1
+      self.labels[even] = 0
+      self.bestFrom[odd] = 0
+      self.setBestFrom(even)
+      self.push(even)
+    self.labels[base] = 1
+    self.parents[base] = self.parents[blossom]
+    for flower in inner[position + 1:]:
+      self.labels[flower] = -1
+      self.setBestFrom(flower)
+    self.outer[blossom] = 0
+
+  def onTightEdge(self, end1: int, end2: int) -> bool:
+    # Returns whether the matching was augmented.
+    u = int(self.outer[end1])
+    v = int(self.outer[end2])
+    if self.labels[v] == -1:
+      self.parents[v] = end1
+      self.labels[v] = 1
+      next = int(self.outer[self.match[v]])
+      self.bestFrom[v] = self.bestFrom[next] = 0
+      self.labels[next] = 0
+      self.push(next)
+    elif self.labels[v] == 0:
+      lca = self.findLCA(u, v)
+      if lca == 0:
+        self.augment(u, v)
+        self.augment(v, u)
+        return True
+      self.addBlossom(u, lca, v)
+    return False
+
+  def findAugmentingPath(self) -> bool:
+    n = self.n
+    flowers = np.arange(1, self.outerCount + 1)
+    self.labels[flowers] = -1
+    self.bestFrom[flowers] = 0
+    self.queue = deque()
+    for x in flowers[(self.outer[flowers] == flowers) & (self.match[flowers] == 0)].tolist():
+      self.parents[x] = 0
+      self.labels[x] = 0
+      self.push(x)
+    if len(self.queue) == 0:
+      return False
+
+    vertices = np.arange(1, n + 1)
+    while True:
+      while len(self.queue) > 0:
+        u = self.queue.popleft()
+        if self.labels[self.outer[u]] == 1:
+          continue
+        # The edge from u to an outer flower is the tightest edge from u to any of its vertices.
+        columns = np.arange(1, self.outerCount + 1)
+        outer = columns[(self.outer[columns] == columns) & (self.weights[u][columns] > 0) & (columns != self.outer[u])]
+        slacks = self.getRowSlacks(u, outer)
+        for x in outer[slacks == 0].tolist():
+          if self.outer[u] != self.outer[x] and self.outer[x] == x and self.onTightEdge(int(self.ends1[u, x]), int(self.ends2[u, x])):
+            return True
+        self.updateBestFrom(u, outer[slacks != 0], slacks[slacks != 0])
+
+      # The dual step, the largest one which keeps all the duals feasible.
+      flowers = np.arange(1, self.outerCount + 1)
+      flowers = flowers[self.outer[flowers] == flowers]
+      steps: List[npt.NDArray[np.int64]] = []
+      blossoms = flowers[(flowers > n) & (self.labels[flowers] == 1)]
+      steps.append(self.duals[blossoms] // 2)
+      reached = flowers[self.bestFrom[flowers] != 0]
+      slacks = self.getSlacks(self.bestFrom[reached], reached)
+      steps.append(slacks[self.labels[reached] == -1])
+      steps.append(slacks[self.labels[reached] == 0] // 2)
+      allSteps = np.concatenate(steps)
+      step: Optional[int] = int(allSteps.min()) if len(allSteps) > 0 else None
+
+      vertexLabels = self.labels[self.outer[1:n + 1]]
+      even = vertices[vertexLabels == 0]
+      if step is None or np.any(self.duals[even] <= step):
+        return False
+      self.duals[even] -= step
+      self.duals[vertices[vertexLabels == 1]] += step
+      blossoms = flowers[flowers > n]
+      self.duals[blossoms[self.labels[blossoms] == 0]] += 2 * step
+      self.duals[blossoms[self.labels[blossoms] == 1]] -= 2 * step
+
+      self.queue = deque()
+      reached = flowers[self.bestFrom[flowers] != 0]
+      for x in reached[self.getSlacks(self.bestFrom[reached], reached) == 0].tolist():
+        end = int(self.bestFrom[x])
+        if self.outer[x] == x and end != 0 and self.outer[end] != x and self.getSlack(end, x) == 0:
+          if self.onTightEdge(int(self.ends1[end, x]), int(self.ends2[end, x])):
+            return True
+      for blossom in blossoms[(self.labels[blossoms] == 1) & (self.duals[blossoms] == 0)].tolist():
+        if self.outer[blossom] == blossom and self.labels[blossom] == 1 and self.duals[blossom] == 0:
+          self.expandBlossom(blossom)
+
+  def solve(self) -> List[int]:
+    # Returns the ids of the edges in the matching.
+    while self.findAugmentingPath():
+      pass
+    if self.perfect and np.any(self.match[1:self.n + 1] == 0):
+      raise ValueError("There is no perfect matching")
+    vertices = np.arange(1, self.n + 1)
+    mates = self.match[vertices]
+    first = vertices < mates
+    return sorted(self.edgeIds[vertices[first], mates[first]].tolist())
+
+def solveDense(graph: Graph, perfect: bool = True) -> List[int]:
+  return DenseMatching(graph, perfect).solve()
@@ -1,11 +1,14 @@
 from src.dataStructures import Edge, Flower
 
 
-def findConnectingEdge(f1: Flower, f2: Flower, edges: list[Edge]) -> Edge:
-  allInner1 = f1.getAllLowestLevelFlowers()
-  allInner2 = f2.getAllLowestLevelFlowers()
-  for edge in edges:
-    if (edge.v1 in allInner1 and edge.v2 in allInner2) or (edge.v2 in allInner1 and edge.v1 in allInner2):
-      return edge
-    
-  raise ValueError("No edge has been found")
\ No newline at end of file
+def findConnectingEdge(flower: Flower, index1: int, index2: int) -> Edge:
+  """
+  Returns the edge connecting two neighbouring inner flowers of the flower, given by their indices.
+  """
+  count = len(flower.innerFlowers)
+  if (index1 + 1) % count == index2:
+    return flower.innerEdges[index1]
+  if (index2 + 1) % count == index1:
+    return flower.innerEdges[index2]
+
+  raise ValueError("The inner flowers are not neighbours")
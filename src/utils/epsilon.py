@@ -1,35 +1,58 @@
-import sys
-from src.dataStructures import Dumbbell, Edge, Tree
-from src.utils.typeOfFlower import isInDumbbell, isInTreeOnEvenDepth
-
-
-def calculateEpsilon(trees: list[Tree], otherEdges: list[Edge], dumbbells: list[Dumbbell]) -> float:
-  epsilon: float = sys.float_info.max
-  for tree in trees:
-    treeEpsilon = tree.root.getMinEpsilon(0)
-    if treeEpsilon < epsilon:
-      epsilon = treeEpsilon
-  
-  treeRoots = list(map(lambda x: x.root, trees))
-
-  for edge in otherEdges:
-    onEvenDepth1 = isInTreeOnEvenDepth(edge.v1, treeRoots)
-    onEvenDepth2 = isInTreeOnEvenDepth(edge.v2, treeRoots)
-
-    # It must connect separate flowers
-    if edge.v1.getTotalOuterFlower() == edge.v2.getTotalOuterFlower():
-      continue
-    # If one end is in a dumbbell and the other one at an even level in some tree, we can add only what the edge can take
-    if (isInDumbbell(edge.v1, dumbbells) and onEvenDepth2) or (isInDumbbell(edge.v2, dumbbells) and onEvenDepth1):
-      edgeEpsilon = edge.getEpsilon()
-      if edgeEpsilon < epsilon:
-        epsilon = edgeEpsilon
-    # If both ends are at an even level in some tree (may be the same one), we can add only half what it can take
-    if onEvenDepth1 and onEvenDepth2:
-      edgeEpsilon = edge.getEpsilon() / 2
-      if edgeEpsilon < epsilon:
-        epsilon = edgeEpsilon
-  
-  assert epsilon < sys.float_info.max
-
-  return epsilon
\ No newline at end of file
+from typing import Tuple
+
+from src.dataStructures import Edge, Flower
+from src.enums.edge import EdgeType
+from src.enums.event import EventType
+from src.enums.flower import FlowerType
+from src.eventQueue import EventItem, EventQueue
+from src.utils.typeOfFlower import isInTree, isInTreeOnEvenDepth
+
+
+def getNextEvent(events: EventQueue) -> Tuple[float, EventType, EventItem]:
+  # The global delta at which the first event happens, its type and item.
+  nextEvent = events.peek()
+  if nextEvent is None:
+    raise ValueError("There is no event which could stop the dual step. The graph has no perfect matching.")
+
+  return nextEvent
+
+def halve(value: float) -> float:
+  # Integers stay exact integers, in the integer mode the value is always even.
+  if isinstance(value, int):
+    assert value % 2 == 0
+    return value // 2
+  return value / 2
+
+def scheduleEdge(edge: Edge, events: EventQueue, globalDelta: float) -> None:
+  """
+  Puts the edge into the queue matching the flowers it connects. If the edge can not get full by changing
+  the charges (it is not other, is inside a flower, or neither end is on an even level), its event is dropped.
+  """
+  if edge.type != EdgeType.OTHER or edge.v1.getTotalOuterFlower() == edge.v2.getTotalOuterFlower():
+    events.discard(edge)
+    return
+
+  onEvenDepth1 = isInTreeOnEvenDepth(edge.v1)
+  onEvenDepth2 = isInTreeOnEvenDepth(edge.v2)
+  # If both ends are at an even level in some tree (may be the same one), we can add only half what it can take
+  if onEvenDepth1 and onEvenDepth2:
+    events.push(EventType.EVEN_EVEN_EDGE, edge, globalDelta + halve(edge.getEpsilon(globalDelta)))
+  # If one end is in a dumbbell and the other one at an even level in some tree, we can add only what the edge can take
+  elif (onEvenDepth1 and not isInTree(edge.v2)) or (onEvenDepth2 and not isInTree(edge.v1)):
+    events.push(EventType.EVEN_DUMBBELL_EDGE, edge, globalDelta + edge.getEpsilon(globalDelta))
+  else:
+    events.discard(edge)
+
+def scheduleFlower(flower: Flower, events: EventQueue, globalDelta: float) -> None:
+  """
+  Reschedules all the edges of an outer flower after its position has changed. If it is a blossom on an odd
+  level, its charge can fall to 0, so it is scheduled as well.
+  """
+  for vertex in flower.getAllLowestLevelFlowers():
+    for edge in vertex.edges:
+      scheduleEdge(edge, events, globalDelta)
+
+  if not flower.isOnlyVertex() and flower.type == FlowerType.ODD:
+    events.push(EventType.ODD_BLOSSOM, flower, globalDelta + flower.getCharge(globalDelta))
+  else:
+    events.discard(flower)
@@ -0,0 +1,108 @@
+import math
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.graph import Graph
+
+
+def withPerfectMatching(vertexCount: int, pairs: npt.NDArray[np.int64], matching: npt.NDArray[np.int64], capacities: npt.NDArray[np.float64], matchingCapacities: npt.NDArray[np.float64]) -> Graph:
+  # The matching edges make sure a perfect matching exists, loops and parallel edges are dropped.
+  endpoints = np.concatenate([matching, pairs]).reshape(-1, 2)
+  allCapacities = np.concatenate([matchingCapacities, capacities])
+  endpoints.sort(axis=1)
+  keep = endpoints[:, 0] != endpoints[:, 1]
+  endpoints = endpoints[keep]
+  allCapacities = allCapacities[keep]
+  _, first = np.unique(endpoints[:, 0] * np.int64(vertexCount) + endpoints[:, 1], return_index=True)
+  first.sort()
+  return Graph(vertexCount, endpoints[first], allCapacities[first])
+
+def randomMatching(vertexCount: int, rng: np.random.Generator) -> npt.NDArray[np.int64]:
+  if vertexCount % 2 != 0:
+    raise ValueError("A perfect matching needs an even number of vertices")
+  return rng.permutation(vertexCount).reshape(-1, 2)
+
+def generateSparse(vertexCount: int, seed: int, averageDegree: float = 6, maxCapacity: int = 1000) -> Graph:
+  rng = np.random.default_rng(seed)
+  edgeCount = int(vertexCount * averageDegree / 2)
+  pairs = rng.integers(0, vertexCount, size=(edgeCount, 2))
+  matching = randomMatching(vertexCount, rng)
+  return withPerfectMatching(
+    vertexCount, pairs, matching,
+    rng.integers(1, maxCapacity + 1, size=edgeCount).astype(np.float64),
+    rng.integers(1, maxCapacity + 1, size=len(matching)).astype(np.float64))
+
+def generateDense(vertexCount: int, seed: int, density: float = 0.5, maxCapacity: int = 1000) -> Graph:
+  # The pairs are drawn with repetition instead of listing all of them, this many draws choose every pair
+  # with the probability of the density. Repeated pairs are dropped.
+  if not 0 <= density < 1:
+    raise ValueError("The density has to be at least 0 and less than 1")
+  rng = np.random.default_rng(seed)
+  edgeCount = int(-math.log1p(-density) * vertexCount * vertexCount / 2)
+  pairs = rng.integers(0, vertexCount, size=(edgeCount, 2))
+  matching = randomMatching(vertexCount, rng)
+  return withPerfectMatching(
+    vertexCount, pairs, matching,
+    rng.integers(1, maxCapacity + 1, size=len(pairs)).astype(np.float64),
+    rng.integers(1, maxCapacity + 1, size=len(matching)).astype(np.float64))
+
+def generateGeometric(vertexCount: int, seed: int, neighbours: int = 6, side: int = 10000) -> Graph:
+  # Random points in a square, every point is connected to its nearest points from the neighbouring grid cells.
+  # The capacity of an edge is the rounded distance of its ends.
+  rng = np.random.default_rng(seed)
+  points = rng.integers(0, side, size=(vertexCount, 2))
+  cellSize = max(1.0, side / math.sqrt(max(1, vertexCount / 4)))
+  cells = (points // cellSize).astype(np.int64)
+
+  buckets: Dict[Tuple[int, int], List[int]] = {}
+  for vertex, (x, y) in enumerate(cells.tolist()):
+    buckets.setdefault((x, y), []).append(vertex)
+
+  pairs: List[npt.NDArray[np.int64]] = []
+  for vertex, (x, y) in enumerate(cells.tolist()):
+    candidates = np.array([other for dx in (-1, 0, 1) for dy in (-1, 0, 1) for other in buckets.get((x + dx, y + dy), []) if other != vertex], dtype=np.int64)
+    if len(candidates) == 0:
+      continue
+    distances = ((points[candidates] - points[vertex]) ** 2).sum(axis=1)
+    nearest = candidates[np.argsort(distances, kind='stable')[:neighbours]]
+    pairs.append(np.stack([np.full(len(nearest), vertex), nearest], axis=1))
+
+  # Consecutive points in the snake order of the cells are close, they give the perfect matching.
+  if vertexCount % 2 != 0:
+    raise ValueError("A perfect matching needs an even number of vertices")
+  snakeY = np.where(cells[:, 0] % 2 == 0, cells[:, 1], -cells[:, 1])
+  order = np.lexsort((snakeY, cells[:, 0]))
+  matching = order.reshape(-1, 2)
+
+  def getDistances(ends: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+    return np.rint(np.sqrt(((points[ends[:, 0]] - points[ends[:, 1]]) ** 2).sum(axis=1)))
+
+  allPairs = np.concatenate(pairs) if len(pairs) > 0 else np.zeros((0, 2), dtype=np.int64)
+  return withPerfectMatching(vertexCount, allPairs, matching, getDistances(allPairs), getDistances(matching))
+
+def generateNested(vertexCount: int, seed: int) -> Graph:
+  """
+  A triangle and pairs of vertices a, b with edges 0 - a - b - 1 to the triangle, getting more expensive with every
+  pair. Every pair closes an odd cycle around the blossom of the previous ones, so the blossoms are nested as deep
+  as there are pairs, and the vertices of the triangle are inside of all of them. The last vertex only has an edge
+  to the last pair, so the graph has a perfect matching. The vertices are numbered randomly.
+  """
+  if vertexCount % 2 != 0 or vertexCount < 4:
+    raise ValueError("The nested graph needs an even number of at least 4 vertices")
+  levels = (vertexCount - 4) // 2
+  a = 3 + 2 * np.arange(levels)
+  edges = [np.array([[0, 1], [1, 2], [0, 2]])] + [np.stack(ends, axis=1) for ends in [(np.zeros(levels, dtype=np.int64), a), (a, a + 1), (a + 1, np.ones(levels, dtype=np.int64))]]
+  edges.append(np.array([[vertexCount - 2, vertexCount - 1]]))
+  levelCapacities = 6 + 4 * np.arange(levels)
+  capacities = np.concatenate([[2, 2, 2], levelCapacities, levelCapacities, levelCapacities, [4 * levels + 10]])
+  labels = np.random.default_rng(seed).permutation(vertexCount)
+  return Graph(vertexCount, labels[np.concatenate(edges)], capacities.astype(np.float64))
+
+GENERATORS: Dict[str, Callable[[int, int], Graph]] = {
+  'sparse': generateSparse,
+  'dense': generateDense,
+  'geometric': generateGeometric,
+  'nested': generateNested,
+}
@@ -0,0 +1,177 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from src.graph import Graph
+from src.instance import Instance
+
+
+# Original edges, which are in the matching if a reduced edge is. Either the id of an edge of the original graph,
+# or a pair of origins of the edges it was composed from.
+Origin = Union[int, Tuple['Origin', 'Origin']]
+Adjacency = List[Dict[int, Tuple[float, Origin]]]
+
+# Degree 2 vertices are folded only if their neighbours have at most this many edges together.
+FOLD_LIMIT = 64
+# Every vertex offers this many of its edges of the smallest slack to the matching, which bounds the cost from above.
+BOUND_EDGES = 8
+# Rounds of raising the charges of the vertices before the slacks are priced.
+ASCENT_ROUNDS = 5
+
+def expandOrigins(origins: List[Origin]) -> List[int]:
+  result: List[int] = []
+  stack = list(origins)
+  while len(stack) > 0:
+    origin = stack.pop()
+    if isinstance(origin, int):
+      result.append(origin)
+    else:
+      stack.extend(origin)
+  return sorted(result)
+
+def removeVertex(adjacency: Adjacency, vertex: int, queue: List[int]) -> None:
+  # Neighbours with at most two edges left can be reduced further.
+  for neighbour in adjacency[vertex]:
+    del adjacency[neighbour][vertex]
+    if len(adjacency[neighbour]) <= 2:
+      queue.append(neighbour)
+  adjacency[vertex] = {}
+
+def reduceGraph(graph: Graph, edgeOrigins: Optional[List[Origin]] = None) -> Tuple[List[Origin], Graph, List[Origin]]:
+  """
+  Reduces the graph without changing its cheapest perfect matching. Of parallel edges only the cheapest one stays.
+  A vertex with one edge has to be matched along it, so both of its ends are removed and the edge is forced.
+  A vertex v with two neighbours a and b is matched to one of them, so the three vertices are folded into one,
+  which keeps the edges of a with the cost of vb added, and the edges of b with the cost of va added.
+
+  Returns the origins of the forced edges, the reduced graph and the origins of its edges. The edges of the graph
+  are their own origins, unless other origins are given.
+  """
+  adjacency: Adjacency = [{} for _ in range(graph.vertexCount)]
+  capacities = graph.capacities.tolist()
+  for id, (u, v) in enumerate(graph.endpoints.tolist()):
+    if v not in adjacency[u] or capacities[id] < adjacency[u][v][0]:
+      adjacency[u][v] = adjacency[v][u] = (capacities[id], id if edgeOrigins is None else edgeOrigins[id])
+
+  alive = [True] * graph.vertexCount
+  forced: List[Origin] = []
+  queue = [vertex for vertex in range(graph.vertexCount) if len(adjacency[vertex]) <= 2]
+  while len(queue) > 0:
+    vertex = queue.pop()
+    if not alive[vertex] or len(adjacency[vertex]) > 2:
+      continue
+
+    if len(adjacency[vertex]) == 0:
+      raise ValueError(f"There is no perfect matching, the vertex {vertex + 1} can not be matched")
+
+    if len(adjacency[vertex]) == 1:
+      ((other, (_, origin)),) = adjacency[vertex].items()
+      forced.append(origin)
+      for end in [vertex, other]:
+        removeVertex(adjacency, end, queue)
+        alive[end] = False
+      continue
+
+    ((a, (capacityA, originA)), (b, (capacityB, originB))) = adjacency[vertex].items()
+    if len(adjacency[a]) + len(adjacency[b]) > FOLD_LIMIT:
+      continue
+
+    # The folded vertex keeps the id of a.
+    removeVertex(adjacency, vertex, queue)
+    alive[vertex] = False
+    folded: Dict[int, Tuple[float, Origin]] = {}
+    for neighbour, (capacity, origin) in adjacency[a].items():
+      if neighbour != b:
+        folded[neighbour] = (capacity + capacityB, (origin, originB))
+    for neighbour, (capacity, origin) in adjacency[b].items():
+      if neighbour != a and (neighbour not in folded or capacity + capacityA < folded[neighbour][0]):
+        folded[neighbour] = (capacity + capacityA, (origin, originA))
+
+    removeVertex(adjacency, a, queue)
+    removeVertex(adjacency, b, queue)
+    alive[b] = False
+    adjacency[a] = folded
+    for neighbour, edge in folded.items():
+      adjacency[neighbour][a] = edge
+    queue.append(a)
+
+  # The rest is the kernel, with vertices and edges numbered again.
+  kernelIds: Dict[int, int] = {}
+  for vertex in range(graph.vertexCount):
+    if alive[vertex]:
+      kernelIds[vertex] = len(kernelIds)
+
+  endpoints: List[Tuple[int, int]] = []
+  kernelCapacities: List[float] = []
+  origins: List[Origin] = []
+  for u in kernelIds:
+    for v, (capacity, origin) in adjacency[u].items():
+      if u < v:
+        endpoints.append((kernelIds[u], kernelIds[v]))
+        kernelCapacities.append(capacity)
+        origins.append(origin)
+
+  return forced, Graph(len(kernelIds), endpoints, kernelCapacities), origins
+
+def findCharges(graph: Graph) -> npt.NDArray[np.float64]:
+  # Feasible charges of the vertices: half of the cheapest edge of every vertex, then raised by half of what is left.
+  us, vs = graph.endpoints[:, 0], graph.endpoints[:, 1]
+  charges = np.full(graph.vertexCount, np.inf)
+  np.minimum.at(charges, us, graph.capacities)
+  np.minimum.at(charges, vs, graph.capacities)
+  charges /= 2
+  for _ in range(ASCENT_ROUNDS):
+    slacks = graph.getSlacks(charges)
+    smallest = np.full(graph.vertexCount, np.inf)
+    np.minimum.at(smallest, us, slacks)
+    np.minimum.at(smallest, vs, slacks)
+    charges += smallest / 2
+  return charges
+
+def findTightestEdges(graph: Graph, slacks: npt.NDArray[np.float64], count: int) -> npt.NDArray[np.int64]:
+  # Ids of the edges, which are among the count edges of the smallest slack of one of their endpoints.
+  ids = np.tile(np.arange(graph.edgeCount), 2)
+  ends = graph.endpoints.T.reshape(-1)
+  order = np.lexsort((slacks[ids], ends))
+  ids, ends = ids[order], ends[order]
+  ranks = np.arange(len(ends)) - np.searchsorted(ends, ends)
+  return np.unique(ids[ranks < count])
+
+def findNeededEdges(graph: Graph) -> Optional[npt.NDArray[np.bool_]]:
+  """
+  Reduced-cost fixing. With feasible charges y of the vertices every perfect matching costs the sum of y plus
+  the slacks of its edges, so an edge with a slack above UB - sum(y) is in no matching cheaper than UB. The upper
+  bound UB is the cost of the cheapest perfect matching of the edges of the smallest slack.
+
+  Returns which edges stay, or None if the bound would cost too much or there is no perfect matching to give it.
+  """
+  charges = findCharges(graph)
+  slacks = graph.getSlacks(charges)
+  tightest = findTightestEdges(graph, slacks, BOUND_EDGES)
+  if 2 * len(tightest) > graph.edgeCount:
+    return None
+
+  instance = Instance.fromGraph(Graph(graph.vertexCount, graph.endpoints[tightest], graph.capacities[tightest]))
+  try:
+    instance.run()
+  except ValueError:
+    return None
+  upperBound = float(graph.capacities[tightest[sorted(instance.selectedEdges)]].sum())
+  gap = upperBound - float(charges.sum())
+  return slacks <= gap + 1e-9 * max(1.0, abs(upperBound))
+
+def solveWithKernel(graph: Graph, solve: Callable[[Graph], List[int]]) -> List[int]:
+  # Solves the reduced graph with the given function, and returns the ids of the edges of the matching in the graph.
+  forced, kernel, origins = reduceGraph(graph)
+  needed = findNeededEdges(kernel) if kernel.vertexCount > 0 else None
+  if needed is not None and not needed.all():
+    # Dropped edges can leave vertices with one or two neighbours, so the rest is reduced again.
+    kept = np.flatnonzero(needed)
+    moreForced, kernel, origins = reduceGraph(Graph(kernel.vertexCount, kernel.endpoints[kept], kernel.capacities[kept]),
+                                              [origins[id] for id in kept.tolist()])
+    forced.extend(moreForced)
+  selected: List[Origin] = list(forced)
+  if kernel.vertexCount > 0:
+    selected.extend(origins[id] for id in solve(kernel))
+  return expandOrigins(selected)
@@ -1,30 +1,53 @@
-from src.dataStructures import Edge, Flower, Tree
-from src.enums.edge import EdgeType
+import os
+
+import numpy as np
+
+from src.graph import Graph
 from src.instance import Instance
+from src.utils.writeFile import saveArrays
+
+
+CACHE_SUFFIX = '.npz'
+
+def parseFileAndReturnInstance(fileName: str, useCache: bool = False) -> Instance:
+  return Instance.fromGraph(parseFileAndReturnGraph(fileName, useCache))
+
+def parseFileAndReturnGraph(fileName: str, useCache: bool = False) -> Graph:
+  # With the cache, the parsed graph is stored in a binary file next to the input and reused while it is newer.
+  cacheName = fileName + CACHE_SUFFIX
+  if useCache and os.path.exists(cacheName) and os.path.getmtime(cacheName) >= os.path.getmtime(fileName):
+    return loadGraph(cacheName)
+
+  graph = parseTextFile(fileName)
+  if useCache:
+    saveGraph(graph, cacheName)
+  return graph
+
+def parseTextFile(fileName: str) -> Graph:
+  # The whole file is read at once, the first two numbers are the number of vertices and edges, then the triples u v w.
+  # The numbers are read as floats, so that the ones which are not integers can be reported instead of truncated.
+  try:
+    values = np.fromfile(fileName, dtype=np.float64, sep=' ')
+  except ValueError as error:
+    raise ValueError(f"Malformed input file {fileName}: {error}") from error
+  if len(values) < 2 or (len(values) - 2) % 3 != 0:
+    raise ValueError(f"Malformed input file {fileName}")
+  notIntegers = ~np.isfinite(values) | (np.rint(values) != values)
+  if np.any(notIntegers):
+    raise ValueError(f"Malformed input file {fileName}: the number {values[np.argmax(notIntegers)]:g} is not an integer")
+
+  vertices = int(values[0])
+  triples = values[2:].reshape(-1, 3)
+  if len(triples) != int(values[1]):
+    raise ValueError(f"Malformed input file {fileName}: the header says {int(values[1])} edges, but there are {len(triples)}")
+  try:
+    return Graph(vertices, triples[:, :2].astype(np.int32) - 1, triples[:, 2])
+  except ValueError as error:
+    raise ValueError(f"Malformed input file {fileName}: {error}") from error
 
+def saveGraph(graph: Graph, fileName: str) -> None:
+  saveArrays({'vertexCount': np.int64(graph.vertexCount), 'endpoints': graph.endpoints, 'capacities': graph.capacities}, fileName)
 
-def parseFileAndReturnInstance(fileName: str) -> Instance:
-  result = Instance()
-
-  with open(fileName, 'r') as file:
-    firstLine = file.readline()
-    values = firstLine.split()
-    vertices = int(values[0])
-
-    for i in range(vertices):
-      flower = Flower(None, None, [], [])
-      flower.textRepr = str(i + 1)
-      newTree = Tree(flower)
-      result.trees.append(newTree)
-    
-    for line in file:
-      values = line.split()
-      v1 = result.trees[int(values[0]) - 1].root
-      v2 = result.trees[int(values[1]) - 1].root
-      capacity = int(values[2])
-      edge = Edge(v1, v2, capacity, f"{values[0]} {values[1]}", EdgeType.OTHER)
-      result.otherEdges.append(edge)
-      v1.edges.append(edge)
-      v2.edges.append(edge)
-
-  return result
\ No newline at end of file
+def loadGraph(fileName: str) -> Graph:
+  with np.load(fileName) as data:
+    return Graph(int(data['vertexCount']), data['endpoints'], data['capacities'])
@@ -1,17 +1,10 @@
-from src.dataStructures import Dumbbell, Flower, Tree
+from src.dataStructures import Flower
+from src.enums.flower import FlowerType
 
 
-def isInDumbbell(flower: Flower, dumbbells: list[Dumbbell]) -> bool:
-  outerFlower = flower.getTotalOuterFlower()
-  for dumbbell in dumbbells:
-    if outerFlower == dumbbell.f1 or outerFlower == dumbbell.f2:
-      return True
-    
-  return False
+def isInTree(flower: Flower) -> bool:
+  # Every outer flower, which is not in a tree, is in a dumbbell.
+  return flower.getTotalOuterFlower().type != FlowerType.DUMBBELL
 
-def isInTreeOnEvenDepth(flower: Flower, treeRoots: list[Flower]) -> bool:
-  outerFlower = flower.getTotalOuterFlower()
-  if outerFlower.getRoot() not in treeRoots:
-    return False
-
-  return outerFlower.depth() % 2 == 0
+def isInTreeOnEvenDepth(flower: Flower) -> bool:
+  return flower.getTotalOuterFlower().type == FlowerType.EVEN
@@ -0,0 +1,178 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.graph import Graph
+
+
+Duals = Tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]
+
+def saveDuals(duals: Duals, fileName: str) -> None:
+  parents, charges = duals
+  with open(fileName, 'wb') as file:
+    np.savez(file, parents=parents, charges=charges)
+
+def loadDuals(fileName: str) -> Duals:
+  with np.load(fileName) as data:
+    return data['parents'].astype(np.int64), data['charges'].astype(np.float64)
+
+def readMatching(fileName: str) -> Tuple[float, List[str]]:
+  """
+  Reads the weight and the lines "u v" of a matching, either in the .out format with the weight on the first line,
+  or as printed by run.py with the line "Total weight w" at the end.
+  """
+  with open(fileName, 'r') as file:
+    lines = [(number, line.strip()) for number, line in enumerate(file.read().splitlines(), 1) if line.strip() != ""]
+  if len(lines) == 0:
+    raise ValueError(f"The matching in {fileName} is empty, not even its weight is given")
+
+  if lines[-1][1].startswith("Total weight"):
+    weightLine, edgeLines = lines[-1], lines[:-1]
+    weightText = weightLine[1][len("Total weight"):].strip()
+  else:
+    weightLine, edgeLines = lines[0], lines[1:]
+    weightText = weightLine[1]
+  try:
+    weight = float(weightText)
+  except ValueError:
+    raise ValueError(f"{fileName}:{weightLine[0]}: expected the weight of the matching, not '{weightLine[1]}'") from None
+
+  for number, line in edgeLines:
+    values = line.split()
+    if len(values) != 2 or not all(value.isdigit() for value in values):
+      raise ValueError(f"{fileName}:{number}: expected an edge 'u v' of the matching, not '{line}'")
+  return weight, [line for _, line in edgeLines]
+
+def findSelectedEdges(graph: Graph, labels: List[str]) -> npt.NDArray[np.int64]:
+  # Edge ids of the lines "u v" of an output file. Of parallel edges the cheapest one is taken.
+  pairs = np.array([label.split() for label in labels], dtype=np.int64).reshape(-1, 2) - 1
+  pairs.sort(axis=1)
+  ends = np.sort(graph.endpoints, axis=1).astype(np.int64)
+  keys = ends[:, 0] * graph.vertexCount + ends[:, 1]
+  order = np.lexsort((graph.capacities, keys))
+  sortedKeys = keys[order]
+  wanted = pairs[:, 0] * graph.vertexCount + pairs[:, 1]
+  positions = np.searchsorted(sortedKeys, wanted)
+  found = positions < len(sortedKeys)
+  found[found] = sortedKeys[positions[found]] == wanted[found]
+  if not np.all(found):
+    missing = pairs[np.argmin(found)] + 1
+    raise ValueError(f"The matching contains {missing[0]} {missing[1]}, which is not an edge of the graph")
+  return order[positions]
+
+def getDepths(parents: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+  # One step up the nesting for all the nodes at once, as many times as the family is deep.
+  depths = np.zeros(len(parents), dtype=np.int64)
+  ancestors = parents.copy()
+  while True:
+    nested = ancestors >= 0
+    if not np.any(nested):
+      return depths
+    depths[nested] += 1
+    ancestors[nested] = parents[ancestors[nested]]
+
+def findLowestCommonNodes(parents: npt.NDArray[np.int64], depths: npt.NDArray[np.int64], us: npt.NDArray[np.int64], vs: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+  # The smallest blossom containing both ends of every edge, or -1, by binary lifting over all the edges at once.
+  ancestors = [np.where(parents >= 0, parents, np.arange(len(parents)))]
+  while (1 << len(ancestors)) <= depths.max(initial=0):
+    ancestors.append(ancestors[-1][ancestors[-1]])
+
+  us = us.copy()
+  vs = vs.copy()
+  swap = depths[us] < depths[vs]
+  us[swap], vs[swap] = vs[swap], us[swap]
+  difference = depths[us] - depths[vs]
+  for level, ancestor in enumerate(ancestors):
+    lift = (difference >> level) & 1 == 1
+    us[lift] = ancestor[us[lift]]
+  for ancestor in reversed(ancestors):
+    lift = ancestor[us] != ancestor[vs]
+    us[lift] = ancestor[us[lift]]
+    vs[lift] = ancestor[vs[lift]]
+  different = us != vs
+  us[different] = parents[us[different]]
+  return us
+
+def verifyMatching(graph: Graph, selected: npt.ArrayLike, duals: Optional[Duals] = None, tolerance: float = 1e-6, perfect: bool = True) -> List[str]:
+  """
+  Checks that the selected edges are a perfect matching and, with the duals exported by the instance, that it is
+  optimal: the charges are feasible, every selected edge is full and every blossom with a positive charge has
+  exactly one selected edge leaving it. Every check goes over all the edges at once, in O(m) apart from the
+  logarithm of the nesting depth. Returns the list of problems found, the matching is proven optimal if it is empty.
+
+  Without a perfect matching, vertices can be unmatched, the total charge of every vertex has to be at most 0
+  and exactly 0 for the unmatched ones.
+  """
+  problems: List[str] = []
+  selectedIds = np.asarray(selected, dtype=np.int64).reshape(-1)
+  n = graph.vertexCount
+  covered = np.bincount(graph.endpoints[selectedIds].reshape(-1), minlength=n)
+  wrong = covered > 1 if not perfect else covered != 1
+  if np.any(wrong):
+    vertex = int(np.flatnonzero(wrong)[0])
+    problems.append(f"The vertex {vertex + 1} is covered by {covered[vertex]} edges of the matching")
+  if duals is None:
+    return problems
+
+  parents, charges = duals
+  if len(parents) != len(charges) or len(parents) < n:
+    return problems + ["The duals do not have a charge for every vertex"]
+  if np.any(parents[:n] >= len(parents)) or np.any((parents >= 0) & (parents < n)) or \
+     np.any((parents >= 0) & (parents <= np.arange(len(parents)))):
+    return problems + ["The blossoms of the duals are not a laminar family of vertices"]
+
+  # Numbers of vertices in the blossoms and the sums of the charges of the blossoms containing every node.
+  depths = getDepths(parents)
+  sizes = np.zeros(len(parents), dtype=np.int64)
+  sizes[:n] = 1
+  blossomCharges = np.where(np.arange(len(parents)) >= n, charges, 0)
+  outerCharges = blossomCharges.copy()
+  byDepth = np.argsort(depths, kind='stable')
+  levelStarts = np.searchsorted(depths[byDepth], np.arange(depths.max(initial=0) + 2))
+  for depth in range(1, len(levelStarts) - 1):
+    nodes = byDepth[levelStarts[depth]:levelStarts[depth + 1]]
+    outerCharges[nodes] += outerCharges[parents[nodes]]
+  for depth in range(len(levelStarts) - 2, 0, -1):
+    nodes = byDepth[levelStarts[depth]:levelStarts[depth + 1]]
+    np.add.at(sizes, parents[nodes], sizes[nodes])
+
+  blossoms = np.arange(n, len(parents))
+  if np.any(sizes[blossoms] % 2 == 0) or np.any(sizes[blossoms] < 3):
+    problems.append(f"The blossom {int(blossoms[np.argmax((sizes[blossoms] % 2 == 0) | (sizes[blossoms] < 3))])} does not have an odd number of at least 3 vertices")
+  if np.any(charges[blossoms] < -tolerance):
+    problems.append(f"The blossom {int(blossoms[np.argmin(charges[blossoms])])} has a negative charge")
+
+  if not perfect:
+    totals = charges[:n] + outerCharges[:n]
+    if np.any(totals > tolerance):
+      problems.append(f"The vertex {int(np.argmax(totals)) + 1} has a positive total charge")
+    unmatched = np.flatnonzero(covered == 0)
+    if np.any(np.abs(totals[unmatched]) > tolerance):
+      problems.append(f"The unmatched vertex {int(unmatched[np.argmax(np.abs(totals[unmatched]))]) + 1} has a nonzero total charge")
+
+  # An edge gets the charges of its ends and of the blossoms containing exactly one of them.
+  us = graph.endpoints[:, 0].astype(np.int64)
+  vs = graph.endpoints[:, 1].astype(np.int64)
+  common = findLowestCommonNodes(parents, depths, us, vs)
+  commonCharges = np.where(common >= 0, outerCharges[np.maximum(common, 0)], 0)
+  slacks = graph.capacities - charges[us] - charges[vs] - outerCharges[us] - outerCharges[vs] + 2 * commonCharges
+  if np.any(slacks < -tolerance):
+    edge = int(np.argmin(slacks))
+    problems.append(f"The edge {us[edge] + 1} {vs[edge] + 1} has charge {graph.capacities[edge] - slacks[edge]:g} over its capacity {graph.capacities[edge]:g}")
+  if len(selectedIds) > 0 and np.any(np.abs(slacks[selectedIds]) > tolerance):
+    edge = int(selectedIds[np.argmax(np.abs(slacks[selectedIds]))])
+    problems.append(f"The edge {us[edge] + 1} {vs[edge] + 1} of the matching is not full")
+
+  # A blossom of k vertices is left by one selected edge if k // 2 selected edges are inside of it.
+  inside = np.zeros(len(parents), dtype=np.int64)
+  selectedCommon = common[selectedIds]
+  np.add.at(inside, selectedCommon[selectedCommon >= 0], 1)
+  for depth in range(len(levelStarts) - 2, 0, -1):
+    nodes = byDepth[levelStarts[depth]:levelStarts[depth + 1]]
+    np.add.at(inside, parents[nodes], inside[nodes])
+  leaking = blossoms[(charges[blossoms] > tolerance) & (inside[blossoms] != sizes[blossoms] // 2)]
+  if len(leaking) > 0:
+    problems.append(f"The blossom {int(leaking[0])} has a positive charge, but not exactly one edge of the matching leaving it")
+
+  return problems
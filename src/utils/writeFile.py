@@ -0,0 +1,39 @@
+import os
+import tempfile
+from typing import List, Mapping, TextIO, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from src.instance import Instance
+
+
+def getTotalWeight(instance: Instance) -> float:
+  return sum(edge.capacity for edge in instance.selectedEdges.values()) / instance.scale
+
+def getMatching(instance: Instance) -> Tuple[float, List[str]]:
+  # The weight of the matching and the labels of its edges.
+  return getTotalWeight(instance), [edge.textRepr for edge in instance.selectedEdges.values()]
+
+def formatWeight(weight: float) -> str:
+  return str(int(weight)) if weight.is_integer() else str(weight)
+
+def writeMatching(weight: float, labels: List[str], file: TextIO) -> None:
+  # The output format: the weight of the matching on the first line, then the edges of the matching.
+  file.write("\n".join([formatWeight(weight)] + labels) + "\n")
+
+def writeMatchingToFile(weight: float, labels: List[str], fileName: str) -> None:
+  with open(fileName, 'w', buffering=1 << 20) as file:
+    writeMatching(weight, labels, file)
+
+def saveArrays(arrays: Mapping[str, npt.ArrayLike], fileName: str) -> None:
+  # Written to a temporary file first, so an interrupted save never replaces a good file with a broken one. The name
+  # is unique, so that processes saving the same file at once do not write into each other's temporary file.
+  descriptor, temporaryName = tempfile.mkstemp(prefix=os.path.basename(fileName) + '.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(fileName)))
+  try:
+    with os.fdopen(descriptor, 'wb') as file:
+      np.savez(file, allow_pickle=False, **arrays)
+    os.replace(temporaryName, fileName)
+  except BaseException:
+    os.unlink(temporaryName)
+    raise
@@ -0,0 +1,38 @@
+import argparse
+import sys
+
+from src.graph import Graph
+from src.utils.parseFile import parseFileAndReturnGraph
+from src.utils.verify import findSelectedEdges, loadDuals, readMatching, verifyMatching
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description="Checks a matching in the .out format without solving the graph again.")
+  parser.add_argument('input', help="the input file with the graph")
+  parser.add_argument('output', help="the matching, its weight on the first line followed by lines u v, or the output of run.py")
+  parser.add_argument('--duals', help="charges saved by run.py --export-duals, which prove the matching is optimal")
+  parser.add_argument('--tolerance', type=float, default=1e-6)
+  parser.add_argument('--max-weight', action='store_true', help="the matching is a maximum weight matching from run.py --max-weight")
+  args = parser.parse_args()
+
+  graph = parseFileAndReturnGraph(args.input)
+  try:
+    givenWeight, labels = readMatching(args.output)
+  except ValueError as error:
+    parser.error(str(error))
+  # A maximum weight matching is the cheapest one with the negated weights, its duals belong to them too.
+  costs = Graph(graph.vertexCount, graph.endpoints, -graph.capacities) if args.max_weight else graph
+  selected = findSelectedEdges(costs, labels)
+  duals = loadDuals(args.duals) if args.duals is not None else None
+  problems = verifyMatching(costs, selected, duals, args.tolerance, not args.max_weight)
+
+  weight = float(graph.capacities[selected].sum())
+  if abs(givenWeight - weight) > args.tolerance:
+    problems.append(f"The weight of the matching is {weight:g}, not {givenWeight:g}")
+
+  for problem in problems:
+    print(problem, file=sys.stderr)
+  if len(problems) > 0:
+    sys.exit(1)
+  kind = "a matching" if args.max_weight else "perfect"
+  print("The matching is optimal" if duals is not None else f"The matching is {kind}, without the duals its optimality is not checked")